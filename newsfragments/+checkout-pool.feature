@@ -0,0 +1,3 @@
+Reuse git checkouts across tasks, from a pool of checkouts per branch
+bounded by ``GIT_CHECKOUT_POOL_SIZE``, instead of cloning in a temporary directory
+for each task.
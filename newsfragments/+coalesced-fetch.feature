@@ -0,0 +1,3 @@
+Serialize fetches of the git cache of a repository with a lock, and skip the
+fetch when another task fetched while waiting for the lock, or less than
+``GIT_FETCH_FRESHNESS`` seconds ago.
@@ -0,0 +1,2 @@
+Read GitHub API resources again with conditional requests (ETag), so
+unchanged resources do not count in the API rate limit.
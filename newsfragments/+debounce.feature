@@ -0,0 +1,2 @@
+Debounce label_modified_addons and tag_approved, so a burst of events on a
+pull request runs them once, after ``TASK_DEBOUNCE_DELAY`` seconds.
@@ -0,0 +1,3 @@
+Optionally queue the merge bot, rebase bot and main branch bot tasks in
+per-repository lanes (``GIT_LANES``), so tasks modifying the same repository
+run in order instead of competing to push.
@@ -0,0 +1,3 @@
+Reuse GitHub API sessions and their connections across tasks of a worker
+process, configured with ``GITHUB_SESSION_POOL_SIZE`` and
+``GITHUB_SESSION_MAX_IDLE``.
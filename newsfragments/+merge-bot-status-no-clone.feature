@@ -0,0 +1,2 @@
+The merge bot checks the head and the status of the merge bot branch with the
+GitHub API, and only clones the repository when it proceeds to merge.
@@ -0,0 +1,4 @@
+Check push permissions with the collaborator permission endpoint instead of
+listing all collaborators, and cache them in Redis (``CACHE_URI``) for
+``GITHUB_PERMISSION_CACHE_TTL`` seconds. The cache is invalidated by ``member``,
+``membership``, ``team`` and ``organization`` webhooks.
@@ -0,0 +1,2 @@
+Load the state of pull requests (mergeability, reviews, labels, checks) with
+a single GraphQL query in tag_approved, tag_needs_review and merge_bot_status.
@@ -0,0 +1,2 @@
+Track the GitHub API rate limit budget across workers, postpone nightly
+tasks before they exhaust it, and wait as asked by secondary rate limits.
@@ -0,0 +1,4 @@
+Make the hourly ``ready to merge`` sweep incremental, searching only PRs that
+became old enough or changed since the previous sweep, and label and comment
+them in batched GraphQL mutations. Approved PRs are evaluated as soon as their
+status or checks succeed.
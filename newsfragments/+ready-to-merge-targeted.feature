@@ -0,0 +1,2 @@
+When a PR is approved, evaluate only that PR for the ``ready to merge`` label
+instead of searching all PRs of the organization.
@@ -0,0 +1,3 @@
+Use sparse checkouts containing only root files and addon manifests for tasks
+that only need to know which addons are modified (modified addons labels,
+maintainers mention, migration issue permission check).
@@ -0,0 +1,2 @@
+Add the ``GIT_FETCH_TARGETED`` option to fetch only the branch and pull request
+refs needed by a task into the git cache, instead of all branches.
@@ -0,0 +1,3 @@
+Acknowledge webhook deliveries before handling them: events are queued in
+memory (up to ``WEBHOOK_QUEUE_SIZE``) and handled in the background, and the
+tasks they trigger are published to the broker in batches.
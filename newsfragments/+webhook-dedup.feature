@@ -0,0 +1,2 @@
+Ignore redelivered webhook events, and do not queue a task identical to a
+task that is queued and not started yet, for ``WEBHOOK_DEDUP_TTL`` seconds.
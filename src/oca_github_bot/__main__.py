@@ -7,6 +7,7 @@ This is the main program, which provides the dispatching
 mechanisms for webhook calls from github.
 """
 
+import asyncio
 import logging
 
 import aiohttp
@@ -14,11 +15,32 @@ from aiohttp import web
 from gidgethub import aiohttp as gh_aiohttp
 from gidgethub import sansio as gh_sansio
 
-from . import config
+from . import cache, config, queue
 from .router import router
 
 _logger = logging.getLogger(__name__)
 
+HTTP_SESSION = web.AppKey("http_session", aiohttp.ClientSession)
+EVENTS = web.AppKey("events", asyncio.Queue)
+DISPATCHER = web.AppKey("dispatcher", asyncio.Task)
+# maximum number of events whose tasks are published together
+WEBHOOK_BATCH_SIZE = 100
+
+
+class LazyGitHubAPI:
+    """gidgethub GitHubAPI, constructed when a handler first uses it."""
+
+    def __init__(self, session):
+        self._session = session
+        self._gh = None
+
+    def __getattr__(self, name):
+        if self._gh is None:
+            self._gh = gh_aiohttp.GitHubAPI(
+                self._session, config.GITHUB_LOGIN, oauth_token=config.GITHUB_TOKEN
+            )
+        return getattr(self._gh, name)
+
 
 async def webhook(request):
     """This is the main webhook dispatcher
@@ -31,22 +53,101 @@ async def webhook(request):
     event = gh_sansio.Event.from_http(
         request.headers, body, secret=config.GITHUB_SECRET
     )
-    async with aiohttp.ClientSession() as session:
-        gh = gh_aiohttp.GitHubAPI(
-            session, config.GITHUB_LOGIN, oauth_token=config.GITHUB_TOKEN
-        )
-        await router.dispatch(event, gh)
+    # acknowledge immediately, the event is handled in the background
+    try:
+        request.app[EVENTS].put_nowait(event)
+    except asyncio.QueueFull:
+        _logger.error("webhook queue full, dropping %s", event.delivery_id)
+        return web.Response(status=503)
+
+    return web.Response(status=202)
+
+
+async def _dispatch_events(app):
+    """Dispatch queued events, and publish the tasks they queue in batches."""
+    events = app[EVENTS]
+    loop = asyncio.get_running_loop()
+    while True:
+        batch = [await events.get()]
+        while not events.empty() and len(batch) < WEBHOOK_BATCH_SIZE:
+            batch.append(events.get_nowait())
+        delivery_keys = [f"delivery:{event.delivery_id}" for event in batch]
+        claimed = []
+        # deliveries not handled, which GitHub may deliver again
+        failed = []
+        try:
+            # GitHub may deliver the same event more than once
+            new_deliveries = await loop.run_in_executor(
+                None, cache.add_many, delivery_keys, config.WEBHOOK_DEDUP_TTL
+            )
+            with queue.collect_publishes() as publishes:
+                for event, key, new_delivery in zip(
+                    batch, delivery_keys, new_deliveries, strict=False
+                ):
+                    if not new_delivery:
+                        _logger.info("ignoring redelivery %s", event.delivery_id)
+                        continue
+                    claimed.append(key)
+                    try:
+                        gh = LazyGitHubAPI(app[HTTP_SESSION])
+                        await router.dispatch(event, gh)
+                    except Exception:
+                        _logger.exception("error handling %s", event.delivery_id)
+                        failed.append(key)
+            # publishing is blocking I/O, keep it out of the event loop
+            await loop.run_in_executor(None, queue.publish_batch, publishes)
+        except Exception:
+            _logger.exception("error publishing tasks")
+            failed = claimed
+        try:
+            if failed:
+                await loop.run_in_executor(None, cache.delete_many, failed)
+        finally:
+            for _ in batch:
+                events.task_done()
+
+
+async def _open_http_session(app):
+    # shared by all deliveries, so connections to GitHub are reused
+    app[HTTP_SESSION] = aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=config.WEBHOOK_HTTP_CONNECTIONS)
+    )
 
-    return web.Response(status=200)
+
+async def _close_http_session(app):
+    await app[HTTP_SESSION].close()
+
+
+async def _start_dispatcher(app):
+    app[EVENTS] = asyncio.Queue(maxsize=config.WEBHOOK_QUEUE_SIZE)
+    app[DISPATCHER] = asyncio.create_task(_dispatch_events(app))
+
+
+async def _stop_dispatcher(app):
+    # give queued events a chance to be handled before exiting
+    try:
+        await asyncio.wait_for(app[EVENTS].join(), timeout=10)
+    except asyncio.TimeoutError:
+        _logger.error("exiting with %s unhandled events", app[EVENTS].qsize())
+    app[DISPATCHER].cancel()
+
+
+def make_app():
+    app = web.Application()
+    app.router.add_post("/", webhook)
+    app.on_startup.append(_open_http_session)
+    app.on_startup.append(_start_dispatcher)
+    # on_shutdown runs before on_cleanup, so the session is still open
+    app.on_shutdown.append(_stop_dispatcher)
+    app.on_cleanup.append(_close_http_session)
+    return app
 
 
 def main():
     # configure logging
     logging.basicConfig(level=logging.DEBUG)
     # launch webhook app
-    app = web.Application()
-    app.router.add_post("/", webhook)
-    web.run_app(app, host=config.HTTP_HOST, port=config.HTTP_PORT)
+    web.run_app(make_app(), host=config.HTTP_HOST, port=config.HTTP_PORT)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,117 @@
+# Copyright (c) ACSONE SA/NV 2026
+# Distributed under the MIT License (http://opensource.org/licenses/MIT).
+
+"""Cache shared by the webhook server and the workers, in Redis.
+
+The cache is an optimization: when it is not configured or Redis is not
+reachable, reads miss and writes are ignored, so callers fall back
+to computing the values.
+"""
+
+import logging
+import time
+
+import redis
+
+from . import config
+
+_logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "oca-github-bot:"
+# seconds to wait before trying again after a Redis error
+RETRY_DELAY = 30
+
+_client = None
+_unavailable_until = 0
+
+
+def get_client():
+    """Return the Redis client of the cache, or None if it is not available."""
+    global _client
+    if not config.CACHE_URI or time.time() < _unavailable_until:
+        return None
+    if _client is None:
+        _client = redis.Redis.from_url(
+            config.CACHE_URI,
+            socket_connect_timeout=1,
+            socket_timeout=1,
+            decode_responses=True,
+        )
+    return _client
+
+
+def _error(e):
+    global _unavailable_until
+    _logger.warning("cache unavailable: %s", e)
+    _unavailable_until = time.time() + RETRY_DELAY
+
+
+def get(key):
+    client = get_client()
+    if client is None:
+        return None
+    try:
+        return client.get(KEY_PREFIX + key)
+    except redis.RedisError as e:
+        _error(e)
+        return None
+
+
+def set(key, value, ttl):
+    client = get_client()
+    if client is None:
+        return
+    try:
+        client.set(KEY_PREFIX + key, value, ex=ttl)
+    except redis.RedisError as e:
+        _error(e)
+
+
+def incr(key):
+    """Increment a counter, typically to invalidate keys that embed it."""
+    client = get_client()
+    if client is None:
+        return
+    try:
+        client.incr(KEY_PREFIX + key)
+    except redis.RedisError as e:
+        _error(e)
+
+
+def delete(key):
+    client = get_client()
+    if client is None:
+        return
+    try:
+        client.delete(KEY_PREFIX + key)
+    except redis.RedisError as e:
+        _error(e)
+
+
+def delete_many(keys):
+    client = get_client()
+    if client is None or not keys:
+        return
+    try:
+        client.delete(*(KEY_PREFIX + key for key in keys))
+    except redis.RedisError as e:
+        _error(e)
+
+
+def add_many(keys, ttl):
+    """Set keys that do not exist yet, for ttl seconds.
+
+    Return a list of booleans telling, for each key, if it was added. When
+    the cache is not available, all keys are considered added.
+    """
+    client = get_client()
+    if client is None:
+        return [True] * len(keys)
+    try:
+        pipeline = client.pipeline(transaction=False)
+        for key in keys:
+            pipeline.set(KEY_PREFIX + key, "1", ex=ttl, nx=True)
+        return [bool(added) for added in pipeline.execute()]
+    except redis.RedisError as e:
+        _error(e)
+        return [True] * len(keys)
@@ -33,6 +33,16 @@ def switchable(switch_name=None):
 
 HTTP_HOST = os.environ.get("HTTP_HOST")
 HTTP_PORT = int(os.environ.get("HTTP_PORT") or "8080")
+# Maximum number of simultaneous connections of the webhook server to GitHub
+WEBHOOK_HTTP_CONNECTIONS = int(os.environ.get("WEBHOOK_HTTP_CONNECTIONS") or "20")
+# Maximum number of received webhook events waiting to be handled
+WEBHOOK_QUEUE_SIZE = int(os.environ.get("WEBHOOK_QUEUE_SIZE") or "1000")
+# Number of seconds tasks such as label_modified_addons and tag_approved wait
+# before running, so events in quick succession on a PR run them only once
+TASK_DEBOUNCE_DELAY = int(os.environ.get("TASK_DEBOUNCE_DELAY") or "30")
+# Number of seconds during which redelivered webhook events, and tasks
+# identical to a queued task that has not started yet, are ignored
+WEBHOOK_DEDUP_TTL = int(os.environ.get("WEBHOOK_DEDUP_TTL") or "600")
 
 GITHUB_SECRET = os.environ.get("GITHUB_SECRET")
 GITHUB_LOGIN = os.environ.get("GITHUB_LOGIN")
@@ -50,6 +60,17 @@ ODOO_PASSWORD = os.environ.get("ODOO_PASSWORD")
 
 BROKER_URI = os.environ.get("BROKER_URI", os.environ.get("REDIS_URI", "redis://queue"))
 
+# Redis instance where the webhook server and the workers share caches,
+# by default the broker if it is a Redis instance; empty to disable caching
+CACHE_URI = os.environ.get(
+    "CACHE_URI",
+    BROKER_URI if BROKER_URI.startswith(("redis://", "rediss://")) else "",
+)
+
+# Number of lanes where tasks modifying git repositories are queued, so the
+# tasks of a repository run one at a time, in order; 0 to disable lanes
+GIT_LANES = int(os.environ.get("GIT_LANES") or "0")
+
 SENTRY_DSN = os.environ.get("SENTRY_DSN")
 
 DRY_RUN = os.environ.get("DRY_RUN", "").lower() in ("1", "true", "yes")
@@ -101,6 +122,43 @@ MERGE_BOT_INTRO_MESSAGES = [
 APPROVALS_REQUIRED = int(os.environ.get("APPROVALS_REQUIRED", "2"))
 MIN_PR_AGE = int(os.environ.get("MIN_PR_AGE", "5"))
 
+# Maximum number of reusable git checkouts kept in the cache directory
+GIT_CHECKOUT_POOL_SIZE = int(os.environ.get("GIT_CHECKOUT_POOL_SIZE", "10"))
+
+# Number of seconds during which a fetch of the git cache of a repository
+# is considered fresh enough to be reused by subsequent tasks
+GIT_FETCH_FRESHNESS = float(os.environ.get("GIT_FETCH_FRESHNESS", "0"))
+
+# Fetch only the branches and pull requests refs needed by a task in the
+# git cache, instead of all branches of the repository
+GIT_FETCH_TARGETED = os.environ.get("GIT_FETCH_TARGETED", "").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+
+# Number of idle GitHub API sessions kept open by each worker process
+GITHUB_SESSION_POOL_SIZE = int(os.environ.get("GITHUB_SESSION_POOL_SIZE", "4"))
+
+# Number of seconds after which an idle GitHub API session is not reused
+GITHUB_SESSION_MAX_IDLE = float(os.environ.get("GITHUB_SESSION_MAX_IDLE", "60"))
+
+# Number of seconds the permission of a user on a repository is cached
+GITHUB_PERMISSION_CACHE_TTL = int(os.environ.get("GITHUB_PERMISSION_CACHE_TTL", "300"))
+
+# Number of GitHub API requests of the rate limit budget that low priority
+# tasks (such as main_branch_bot_all_repos and tag_ready_to_merge) leave
+# to the others; they are postponed until the rate limit reset when fewer
+# requests remain
+GITHUB_RATE_LIMIT_RESERVE = int(os.environ.get("GITHUB_RATE_LIMIT_RESERVE", "1000"))
+
+# Number of seconds the ETag and body of GitHub API responses are kept in the
+# cache, to read them again with conditional requests; 0 to disable
+GITHUB_HTTP_CACHE_TTL = int(os.environ.get("GITHUB_HTTP_CACHE_TTL", "86400"))
+# Maximum size in bytes of the GitHub API response bodies kept in the cache,
+# larger responses are not cached
+GITHUB_HTTP_CACHE_MAX_SIZE = int(os.environ.get("GITHUB_HTTP_CACHE_MAX_SIZE", "65536"))
+
 MODULE_LABEL_COLOR = os.environ.get("MODULE_LABEL_COLOR", "#ffc")
 
 dist_publisher = MultiDistPublisher()
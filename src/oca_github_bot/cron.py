@@ -4,7 +4,7 @@
 from celery.schedules import crontab
 
 from .config import GITHUB_ORG
-from .queue import app
+from .queue import LOW_PRIORITY_HEADER, app
 
 beat_schedule = {
     "heartbeat": {
@@ -27,6 +27,7 @@ for org in GITHUB_ORG:
                 "task": "oca_github_bot.tasks.tag_ready_to_merge.tag_ready_to_merge",
                 "args": (org,),
                 "schedule": crontab(minute="0"),
+                "options": {"headers": {LOW_PRIORITY_HEADER: True}},
             },
         }
     )
@@ -0,0 +1,366 @@
+# Copyright (c) ACSONE SA/NV 2026
+# Distributed under the MIT License (http://opensource.org/licenses/MIT).
+
+"""Local git cache helpers.
+
+The cache is made of a bare repository per GitHub repository, holding
+all objects, and of a pool of reusable checkouts per branch, leased to
+one task at a time and sharing their objects with the bare repository.
+"""
+
+import fcntl
+import fnmatch
+import hashlib
+import json
+import logging
+import os
+import shutil
+import subprocess
+import time
+from contextlib import contextmanager
+from urllib.parse import quote
+
+from .process import CalledProcessError, call, check_call, check_output
+
+_logger = logging.getLogger(__name__)
+
+_FETCH_LOCK = "oca-github-bot-fetch.lock"
+_FETCH_STAMPS = "oca-github-bot-fetch.json"
+
+# repo_cache_dir: (fetch generation, ref index)
+_ref_indexes = {}
+
+
+@contextmanager
+def flock(lock_path, blocking=True):
+    """Hold an exclusive cross-process lock on lock_path.
+
+    Yields True when the lock is held. When blocking is False and the lock
+    is held by someone else, yields False without waiting.
+    """
+    operation = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+    while True:
+        fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, operation)
+        except BlockingIOError:
+            os.close(fd)
+            yield False
+            return
+        try:
+            same_file = os.fstat(fd).st_ino == os.stat(lock_path).st_ino
+        except FileNotFoundError:
+            same_file = False
+        if same_file:
+            break
+        # the lock file was removed while we were waiting for it, start over
+        os.close(fd)
+    try:
+        yield True
+    finally:
+        # closing the file descriptor releases the lock
+        os.close(fd)
+
+
+def _read_fetch_stamps(repo_cache_dir):
+    try:
+        with open(os.path.join(repo_cache_dir, _FETCH_STAMPS)) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _write_fetch_stamps(repo_cache_dir, stamps):
+    with open(os.path.join(repo_cache_dir, _FETCH_STAMPS), "w") as f:
+        json.dump(stamps, f)
+
+
+def _fetched_at(stamps, ref):
+    """Return when ref was last fetched, directly or through a pattern."""
+    return max(
+        (
+            fetched_at
+            for fetched_ref, fetched_at in stamps.items()
+            if fetched_ref == ref or fnmatch.fnmatchcase(ref, fetched_ref)
+        ),
+        default=None,
+    )
+
+
+def fetch(repo_cache_dir, repo_url, refs, freshness=0):
+    """Fetch refs from repo_url into the bare repository repo_cache_dir.
+
+    refs are full ref names or patterns, such as ``refs/heads/*``,
+    ``refs/heads/16.0`` or ``refs/pull/42/head``, and are stored under the
+    same name in the cache.
+
+    Fetches of the same repository are serialized with a cross-process lock,
+    so concurrent fetches do not compete for ref locks. Refs that another
+    fetch brought while we were waiting for the lock (we piggy-back on it),
+    or less than freshness seconds ago, are not fetched again.
+
+    Return True if a fetch was done, False if it was skipped.
+    """
+    requested_at = time.time()
+    os.makedirs(repo_cache_dir, exist_ok=True)
+    with flock(os.path.join(repo_cache_dir, _FETCH_LOCK)):
+        if not os.path.exists(os.path.join(repo_cache_dir, "HEAD")):
+            check_call(["git", "init", "--quiet", "--bare"], cwd=repo_cache_dir)
+        stamps = _read_fetch_stamps(repo_cache_dir)
+        stale_refs = []
+        for ref in refs:
+            fetched_at = _fetched_at(stamps, ref)
+            if fetched_at is None or (
+                fetched_at < requested_at and requested_at - fetched_at > freshness
+            ):
+                stale_refs.append(ref)
+        if not stale_refs:
+            _logger.debug("skipping fetch of %s in %s", refs, repo_cache_dir)
+            return False
+        started_at = time.time()
+        check_call(
+            [
+                "git",
+                "fetch",
+                "--quiet",
+                "--force",
+                "--prune",
+                repo_url,
+                *(f"{ref}:{ref}" for ref in stale_refs),
+            ],
+            cwd=repo_cache_dir,
+        )
+        stamps.update((ref, started_at) for ref in stale_refs)
+        _write_fetch_stamps(repo_cache_dir, stamps)
+    return True
+
+
+def ref_index(repo_cache_dir):
+    """Return a dictionary mapping the refs of repo_cache_dir to their sha.
+
+    The index is cached in memory until the next fetch of repo_cache_dir,
+    by this process or another one.
+    """
+    try:
+        generation = os.stat(os.path.join(repo_cache_dir, _FETCH_STAMPS)).st_mtime_ns
+    except FileNotFoundError:
+        generation = None
+    cached = _ref_indexes.get(repo_cache_dir)
+    if cached and cached[0] == generation:
+        return cached[1]
+    index = {}
+    for line in check_output(
+        ["git", "for-each-ref", "--format=%(objectname) %(refname)"],
+        cwd=repo_cache_dir,
+    ).splitlines():
+        sha, ref = line.split(" ", 1)
+        index[ref] = sha
+    _ref_indexes[repo_cache_dir] = (generation, index)
+    return index
+
+
+def _remote_tracking_ref(ref):
+    """Name of ref of the cache in the checkouts, as if fetched from origin."""
+    if ref.startswith("refs/heads/"):
+        return "refs/remotes/origin/" + ref[len("refs/heads/") :]
+    return "refs/remotes/origin/" + ref[len("refs/") :]
+
+
+def _remove_push_credentials(checkout_dir):
+    """Remove the remotes and push URLs, which may embed a token, added by
+    the lessee of a checkout."""
+    if not os.path.isdir(checkout_dir):
+        return
+    remotes = subprocess.run(
+        ["git", "remote"], cwd=checkout_dir, capture_output=True, text=True
+    ).stdout.split()
+    for remote in remotes:
+        if remote != "origin":
+            call(["git", "remote", "remove", remote], cwd=checkout_dir)
+    call(["git", "config", "--unset-all", "remote.origin.pushurl"], cwd=checkout_dir)
+
+
+def _prepare_checkout(checkout_dir, repo_cache_dir, repo_url, branch, refs, sparse):
+    """Bring a new or previously used checkout to a pristine clone state."""
+    git_dir = os.path.join(checkout_dir, ".git")
+    if not os.path.isdir(git_dir):
+        os.makedirs(checkout_dir)
+        check_call(["git", "init", "--quiet"], cwd=checkout_dir)
+        # share objects with the cache, like git clone --shared
+        with open(os.path.join(git_dir, "objects", "info", "alternates"), "w") as f:
+            f.write(os.path.join(os.path.abspath(repo_cache_dir), "objects") + "\n")
+        check_call(["git", "remote", "add", "origin", repo_url], cwd=checkout_dir)
+        if sparse:
+            # configured before the first checkout, so files outside
+            # of the sparse checkout patterns are never written
+            check_call(
+                ["git", "config", "core.sparseCheckout", "true"], cwd=checkout_dir
+            )
+            check_call(
+                ["git", "config", "core.sparseCheckoutCone", "false"], cwd=checkout_dir
+            )
+            os.makedirs(os.path.join(git_dir, "info"), exist_ok=True)
+            with open(os.path.join(git_dir, "info", "sparse-checkout"), "w") as f:
+                f.write("".join(pattern + "\n" for pattern in sparse))
+    for state_dir in ("rebase-merge", "rebase-apply"):
+        shutil.rmtree(os.path.join(git_dir, state_dir), ignore_errors=True)
+    # in case the previous lease did not end normally
+    _remove_push_credentials(checkout_dir)
+    check_call(["git", "remote", "set-url", "origin", repo_url], cwd=checkout_dir)
+    # the cache has just been fetched, so update remote tracking
+    # refs from it instead of going to GitHub again
+    check_call(
+        [
+            "git",
+            "fetch",
+            "--quiet",
+            "--force",
+            "--prune",
+            "--no-tags",
+            repo_cache_dir,
+            *(f"{ref}:{_remote_tracking_ref(ref)}" for ref in refs),
+        ],
+        cwd=checkout_dir,
+    )
+    check_call(
+        ["git", "checkout", "--quiet", "--force", "-B", branch, f"origin/{branch}"],
+        cwd=checkout_dir,
+    )
+    check_call(["git", "reset", "--quiet", "--hard"], cwd=checkout_dir)
+    check_call(["git", "clean", "--quiet", "-ffdx"], cwd=checkout_dir)
+    # remove local branches created by previous lessees
+    local_branches = check_output(
+        ["git", "for-each-ref", "--format=%(refname:short)", "refs/heads/"],
+        cwd=checkout_dir,
+    ).split()
+    other_branches = [b for b in local_branches if b != branch]
+    if other_branches:
+        check_call(
+            ["git", "branch", "--quiet", "-D", *other_branches], cwd=checkout_dir
+        )
+
+
+def evict_checkouts(pool_dir, pool_size):
+    """Remove the least recently used checkouts in excess of pool_size.
+
+    Checkouts that are currently leased are never removed.
+    """
+    if not os.path.isdir(pool_dir):
+        return
+    checkouts = []
+    for name in os.listdir(pool_dir):
+        if name.endswith(".lock"):
+            continue
+        try:
+            last_used = os.stat(os.path.join(pool_dir, name + ".lock")).st_mtime
+        except FileNotFoundError:
+            last_used = 0
+        checkouts.append((last_used, name))
+    checkouts.sort()
+    excess = len(checkouts) - pool_size
+    for _, name in checkouts:
+        if excess <= 0:
+            break
+        checkout_dir = os.path.join(pool_dir, name)
+        lock_path = checkout_dir + ".lock"
+        with flock(lock_path, blocking=False) as locked:
+            if not locked:
+                continue
+            _logger.debug("evicting checkout %s", checkout_dir)
+            shutil.rmtree(checkout_dir, ignore_errors=True)
+            os.unlink(lock_path)
+            excess -= 1
+
+
+@contextmanager
+def leased_checkout(
+    pool_dir,
+    key,
+    repo_cache_dir,
+    repo_url,
+    branch,
+    pool_size,
+    refs=("refs/heads/*",),
+    sparse=None,
+):
+    """Lease a reusable checkout of branch, and yield its directory.
+
+    Checkouts are kept in pool_dir, one or more per key (depending on
+    the number of concurrent leases for the same key). A checkout is reset
+    to the branch head of repo_cache_dir before being handed out, so the
+    cost of preparing it is proportional to what changed since it was last
+    used. The refs of the cache are made available in the checkout under
+    ``refs/remotes/origin/``. When the lease ends, the remotes and push URLs
+    added by the lessee are removed, and the least recently used checkouts
+    in excess of pool_size are evicted.
+
+    sparse is an optional list of (non-cone) sparse checkout patterns,
+    to materialize only part of the working tree. Sparse checkouts are
+    pooled separately from full checkouts.
+    """
+    os.makedirs(pool_dir, exist_ok=True)
+    prefix = quote(key, safe="")
+    if sparse:
+        sparse_hash = hashlib.sha1("\n".join(sparse).encode("utf-8")).hexdigest()
+        prefix += f"~sparse-{sparse_hash[:8]}"
+    slot = 0
+    try:
+        while True:
+            checkout_dir = os.path.join(pool_dir, f"{prefix}.{slot}")
+            lock_path = checkout_dir + ".lock"
+            with flock(lock_path, blocking=False) as locked:
+                if not locked:
+                    # leased by another task
+                    slot += 1
+                    continue
+                try:
+                    try:
+                        _prepare_checkout(
+                            checkout_dir, repo_cache_dir, repo_url, branch, refs, sparse
+                        )
+                    except CalledProcessError:
+                        _logger.warning(
+                            "could not reset checkout %s, cloning again", checkout_dir
+                        )
+                        shutil.rmtree(checkout_dir, ignore_errors=True)
+                        _prepare_checkout(
+                            checkout_dir, repo_cache_dir, repo_url, branch, refs, sparse
+                        )
+                    yield checkout_dir
+                finally:
+                    # don't keep tokens on disk between leases
+                    _remove_push_credentials(checkout_dir)
+                    # the lock file modification time records the last use
+                    os.utime(lock_path)
+            break
+    finally:
+        evict_checkouts(pool_dir, pool_size)
+
+
+def read_blobs(repo_dir, shas):
+    """Return a dictionary mapping blob shas to their content (as bytes).
+
+    All blobs are read with a single git cat-file --batch.
+    """
+    shas = list(dict.fromkeys(shas))
+    if not shas:
+        return {}
+    output = subprocess.run(
+        ["git", "cat-file", "--batch"],
+        input="".join(sha + "\n" for sha in shas).encode("ascii"),
+        stdout=subprocess.PIPE,
+        cwd=repo_dir,
+        check=True,
+    ).stdout
+    blobs = {}
+    pos = 0
+    for sha in shas:
+        eol = output.index(b"\n", pos)
+        header = output[pos:eol].decode("ascii").split()
+        if header[-1] == "missing":
+            raise KeyError(f"blob {sha} not found in {repo_dir}")
+        size = int(header[2])
+        blobs[sha] = output[eol + 1 : eol + 1 + size]
+        # content is followed by a newline
+        pos = eol + 1 + size + 1
+    return blobs
@@ -1,29 +1,84 @@
 # Copyright (c) ACSONE SA/NV 2018-2019
 # Distributed under the MIT License (http://opensource.org/licenses/MIT).
 
-import functools
 import logging
 import os
-import shutil
-import tempfile
+import sys
+import threading
+import time
 from contextlib import contextmanager
 from pathlib import Path
 
 import appdirs
+import celery
 import github3
+import requests
 from celery.exceptions import Retry
 
-from . import config
+from . import cache, config, git_cache, http_cache, queue, ratelimit
 from .process import CalledProcessError, call, check_call, check_output
-from .utils import retry_on_exception
 
 _logger = logging.getLogger(__name__)
 
 
+# idle GitHub sessions of this process: [(last use time, session)]
+_sessions = []
+_sessions_lock = threading.Lock()
+_sessions_pid = os.getpid()
+
+
+def _acquire_session():
+    global _sessions, _sessions_pid
+    with _sessions_lock:
+        if _sessions_pid != os.getpid():
+            # forked worker process, do not share connections with the parent
+            _sessions = []
+            _sessions_pid = os.getpid()
+        while _sessions:
+            last_used, gh = _sessions.pop()
+            if time.time() - last_used < config.GITHUB_SESSION_MAX_IDLE:
+                return gh
+            # GitHub has likely closed its idle connections
+            gh.session.close()
+    gh = github3.login(token=config.GITHUB_TOKEN)
+    gh.session.hooks["response"].append(ratelimit.record_response)
+    if config.GITHUB_HTTP_CACHE_TTL:
+        gh.session.mount("https://", http_cache.ConditionalCacheAdapter())
+    return gh
+
+
+def _release_session(gh):
+    with _sessions_lock:
+        if _sessions_pid == os.getpid() and (
+            len(_sessions) < config.GITHUB_SESSION_POOL_SIZE
+        ):
+            _sessions.append((time.time(), gh))
+            return
+    gh.session.close()
+
+
 @contextmanager
 def login():
-    """GitHub login as decorator so a pool can be implemented later."""
-    yield github3.login(token=config.GITHUB_TOKEN)
+    """GitHub login, with a session from a pool of the current process.
+
+    Sessions keep their connections to GitHub open, so tasks do not pay
+    for a new TLS connection every time. A session is used by one caller
+    at a time, and is discarded when it has been idle too long or when
+    a connection error occurred while using it.
+    """
+    gh = _acquire_session()
+    healthy = True
+    try:
+        yield gh
+    except (requests.exceptions.ConnectionError, github3.exceptions.TransportError):
+        # github3 wraps connection errors of API calls in TransportError
+        healthy = False
+        raise
+    finally:
+        if healthy:
+            _release_session(gh)
+        else:
+            gh.session.close()
 
 
 @contextmanager
@@ -32,17 +87,55 @@ def repository(org, repo):
         yield gh.repository(org, repo)
 
 
+def _worker_task():
+    """Return the task being executed by the worker, if any."""
+    task = celery.current_task
+    if not task or task.request.called_directly:
+        return None
+    return task._get_current_object()
+
+
+def _retry_task(exc, message, countdown):
+    """Retry the current task in countdown seconds.
+
+    Outside of a worker, raise a celery Retry exception. Waiting for the rate
+    limit is not a failure of the task, so it does not count against its
+    max_retries (celery uses the task default when max_retries is None).
+    """
+    task = _worker_task()
+    if task is not None:
+        try:
+            raise task.retry(exc=exc, countdown=countdown, max_retries=sys.maxsize)
+        finally:
+            # retry() keeps the override on the task, for autoretry_for
+            task.__dict__.pop("override_max_retries", None)
+    raise Retry(message=message, exc=exc, when=countdown)
+
+
 def gh_call(func, *args, **kwargs):
-    """Intercept GitHub call to wait when the API rate limit is reached."""
+    """Intercept GitHub call to respect the API rate limits.
+
+    Low priority tasks (see queue.is_low_priority) are postponed when the
+    rate limit budget falls to GITHUB_RATE_LIMIT_RESERVE, and all tasks are
+    postponed when it is exhausted or when GitHub asks to wait (secondary
+    rate limits).
+    """
+    return _rate_limited_call("core", func, args, kwargs)
+
+
+def _rate_limited_call(resource, func, args, kwargs):
+    """gh_call for the rate limit budget of resource (core, graphql...)."""
+    task = _worker_task()
+    if task is not None:
+        countdown = ratelimit.wait_time(queue.is_low_priority(task), resource)
+        if countdown:
+            _retry_task(None, "Retry task when the rate limit allows", countdown)
     try:
         return func(*args, **kwargs)
-    except github3.exceptions.ForbiddenError as e:
-        if not e.response.headers.get("X-RateLimit-Remaining", 1):
-            raise Retry(
-                message="Retry task after rate limit reset",
-                exc=e,
-                when=e.response.headers.get("X-RateLimit-Reset"),
-            ) from e
+    except github3.exceptions.GitHubError as e:
+        countdown = ratelimit.retry_delay(e.response)
+        if countdown is not None:
+            _retry_task(e, "Retry task after rate limit reset", countdown)
         raise
 
 
@@ -58,65 +151,112 @@ class BranchNotFoundError(RuntimeError):
     pass
 
 
+class GraphQLError(RuntimeError):
+    pass
+
+
+def graphql(gh, query, **variables):
+    """Run a GitHub GraphQL query, and return its data."""
+    url = gh._build_url("graphql")
+    data = {"query": query, "variables": variables}
+    # the request is sent after checking the GraphQL rate limit budget
+    result = _rate_limited_call(
+        "graphql", lambda: gh._json(gh._post(url, data=data), 200), (), {}
+    )
+    if result.get("errors"):
+        messages = "; ".join(error["message"] for error in result["errors"])
+        raise GraphQLError(messages)
+    return result["data"]
+
+
+def _repo_cache_dir(org, repo):
+    cache_dir = appdirs.user_cache_dir("oca-mqt")
+    return os.path.join(cache_dir, "github.com", org.lower(), repo.lower())
+
+
+def _repo_cache_refs(branch, extra_refs=()):
+    if config.GIT_FETCH_TARGETED:
+        return [f"refs/heads/{branch}", *extra_refs]
+    return ["refs/heads/*", *extra_refs]
+
+
+def fetch_repo_cache(org, repo, branch, extra_refs=()):
+    """Fetch branch and extra_refs into the git cache of a GitHub repository.
+
+    Return the cache directory, a bare repository where the branch is
+    available as ``refs/heads/{branch}``.
+    """
+    repo_cache_dir = _repo_cache_dir(org, repo)
+    repo_url = f"https://github.com/{org}/{repo}"
+    refs = _repo_cache_refs(branch, extra_refs)
+    # fetch into cache, unless another task just did it
+    try:
+        git_cache.fetch(
+            repo_cache_dir, repo_url, refs, freshness=config.GIT_FETCH_FRESHNESS
+        )
+    except CalledProcessError as e:
+        if f"couldn't find remote ref refs/heads/{branch}" in e.output:
+            raise BranchNotFoundError() from e
+        raise
+    # check if branch exist
+    if f"refs/heads/{branch}" not in git_cache.ref_index(repo_cache_dir):
+        raise BranchNotFoundError()
+    return repo_cache_dir
+
+
 @contextmanager
-def temporary_clone(org, repo, branch):
-    """context manager that clones a git branch into a tremporary directory,
-    and yields the temp dir name, with cache"""
-    # init cache directory
+def temporary_clone(org, repo, branch, extra_refs=(), sparse=None, fetch=True):
+    """context manager that leases a checkout of a git branch from a pool
+    of reusable checkouts, and yields its directory name, with cache
+
+    The checkout is reset to the branch head and cleaned when it is leased,
+    so changes made to it do not outlive the context manager.
+
+    extra_refs is a list of additional refs needed by the caller, such as
+    ``refs/pull/{pr}/head`` or ``refs/heads/{other_branch}``. They are
+    available in the checkout as ``origin/pull/{pr}/head`` and
+    ``origin/{other_branch}`` respectively. With ``GIT_FETCH_TARGETED``,
+    only the branch and extra_refs are fetched from GitHub, otherwise all
+    branches are fetched too.
+
+    sparse is an optional list of sparse checkout patterns (in non-cone
+    mode), for tasks that need only part of the working tree.
+
+    fetch=False skips the fetch from GitHub, for callers that have just
+    done it with fetch_repo_cache.
+    """
+    if fetch:
+        repo_cache_dir = fetch_repo_cache(org, repo, branch, extra_refs)
+    else:
+        repo_cache_dir = _repo_cache_dir(org, repo)
+    refs = _repo_cache_refs(branch, extra_refs)
     cache_dir = appdirs.user_cache_dir("oca-mqt")
-    repo_cache_dir = os.path.join(cache_dir, "github.com", org.lower(), repo.lower())
-    if not os.path.isdir(repo_cache_dir):
-        os.makedirs(repo_cache_dir)
-        check_call(["git", "init", "--bare"], cwd=repo_cache_dir)
     repo_url = f"https://github.com/{org}/{repo}"
     repo_url_with_token = f"https://{config.GITHUB_TOKEN}@github.com/{org}/{repo}"
-    # fetch all branches into cache
-    fetch_cmd = [
-        "git",
-        "fetch",
-        "--quiet",
-        "--force",
-        "--prune",
+    # lease a checkout sharing its objects with the cache
+    with git_cache.leased_checkout(
+        os.path.join(cache_dir, "checkouts"),
+        f"github.com/{org.lower()}/{repo.lower()}/{branch}",
+        repo_cache_dir,
         repo_url,
-        "refs/heads/*:refs/heads/*",
-    ]
-    retry_on_exception(
-        functools.partial(check_call, fetch_cmd, cwd=repo_cache_dir),
-        "error: cannot lock ref",
-        sleep_time=10.0,
-    )
-    # check if branch exist
-    branches = check_output(["git", "branch"], cwd=repo_cache_dir)
-    branches = [b.strip() for b in branches.split()]
-    if branch not in branches:
-        raise BranchNotFoundError()
-    # clone to temp dir, with --reference to cache
-    tempdir = tempfile.mkdtemp()
-    try:
-        clone_cmd = [
-            "git",
-            "clone",
-            "--quiet",
-            "--reference",
-            repo_cache_dir,
-            "--branch",
-            branch,
-            "--",
-            repo_url,
-            tempdir,
-        ]
-        check_call(clone_cmd, cwd=".")
+        branch,
+        config.GIT_CHECKOUT_POOL_SIZE,
+        refs=refs,
+        sparse=sparse,
+    ) as checkout_dir:
         if config.GIT_NAME:
-            check_call(["git", "config", "user.name", config.GIT_NAME], cwd=tempdir)
+            check_call(
+                ["git", "config", "user.name", config.GIT_NAME], cwd=checkout_dir
+            )
         if config.GIT_EMAIL:
-            check_call(["git", "config", "user.email", config.GIT_EMAIL], cwd=tempdir)
+            check_call(
+                ["git", "config", "user.email", config.GIT_EMAIL], cwd=checkout_dir
+            )
         check_call(
             ["git", "remote", "set-url", "--push", "origin", repo_url_with_token],
-            cwd=tempdir,
+            cwd=checkout_dir,
         )
-        yield tempdir
-    finally:
-        shutil.rmtree(tempdir)
+        yield checkout_dir
 
 
 def git_push_if_needed(remote, branch, cwd=None):
@@ -146,11 +286,44 @@ def git_push_if_needed(remote, branch, cwd=None):
     return True
 
 
+def _permissions_generation_key(org):
+    return f"permissions-generation:{org.lower()}"
+
+
+def invalidate_user_permissions(org):
+    """Forget the cached permissions of users on the repositories of org."""
+    cache.incr(_permissions_generation_key(org))
+
+
+def github_user_permission(gh_repo, username):
+    """Return the permission of username on gh_repo.
+
+    It is one of admin, write, read or none, and is cached for
+    GITHUB_PERMISSION_CACHE_TTL seconds, unless permissions of the
+    organization are invalidated in the meantime.
+    """
+    org = gh_repo.owner.login
+    generation = cache.get(_permissions_generation_key(org)) or "0"
+    key = (
+        f"permission:{org.lower()}:{generation}:"
+        f"{gh_repo.name.lower()}:{username.lower()}"
+    )
+    permission = cache.get(key)
+    if permission is None:
+        url = gh_repo._build_url(
+            "collaborators", username, "permission", base_url=gh_repo._api
+        )
+        # 404 when username is not a GitHub user
+        json = gh_call(lambda: gh_repo._json(gh_repo._get(url), 200))
+        permission = json["permission"] if json else "none"
+        if config.GITHUB_PERMISSION_CACHE_TTL:
+            cache.set(key, permission, config.GITHUB_PERMISSION_CACHE_TTL)
+    return permission
+
+
 def github_user_can_push(gh_repo, username):
-    for collaborator in gh_call(gh_repo.collaborators):
-        if username == collaborator.login and collaborator.permissions.get("push"):
-            return True
-    return False
+    # the maintain role has the write permission
+    return github_user_permission(gh_repo, username) in ("admin", "write")
 
 
 def git_get_head_sha(cwd):
@@ -0,0 +1,94 @@
+# Copyright (c) ACSONE SA/NV 2026
+# Distributed under the MIT License (http://opensource.org/licenses/MIT).
+
+"""Conditional requests for GitHub API reads.
+
+The ETag and body of GET responses are stored in the shared cache. When the
+same resource is read again, the request carries ``If-None-Match``, and a
+``304 Not Modified`` response, which GitHub does not count in the rate
+limit, is turned into the stored response.
+
+Search results and listings spanning several pages, which are large and
+change often, are not stored, nor are bodies larger than
+GITHUB_HTTP_CACHE_MAX_SIZE.
+"""
+
+import hashlib
+import json
+from urllib.parse import urlparse
+
+from requests.adapters import HTTPAdapter
+
+from . import cache, config
+
+# headers of the stored response restored on 304 responses, the others
+# (such as rate limit headers) are the ones of the 304 response
+STORED_HEADERS = ("Content-Type", "ETag", "Last-Modified")
+
+
+def _cache_key(request):
+    vary = "\n".join(
+        [
+            request.url,
+            request.headers.get("Accept", ""),
+            request.headers.get("Authorization", ""),
+        ]
+    )
+    return "etag:" + hashlib.sha1(vary.encode("utf-8")).hexdigest()
+
+
+def _is_cacheable(response):
+    return (
+        response.status_code == 200
+        and "ETag" in response.headers
+        and "json" in response.headers.get("Content-Type", "")
+        # page of a paginated listing
+        and "Link" not in response.headers
+        and not urlparse(response.url).path.startswith("/search/")
+        and len(response.content) <= config.GITHUB_HTTP_CACHE_MAX_SIZE
+    )
+
+
+def _get_entry(key):
+    entry = cache.get(key)
+    if entry is None:
+        return None
+    try:
+        return json.loads(entry)
+    except ValueError:
+        return None
+
+
+class ConditionalCacheAdapter(HTTPAdapter):
+    """HTTP adapter revalidating GitHub API reads with their ETag."""
+
+    def send(self, request, stream=False, **kwargs):
+        if (
+            request.method != "GET"
+            or stream
+            or "If-None-Match" in request.headers
+            or "If-Modified-Since" in request.headers
+        ):
+            return super().send(request, stream=stream, **kwargs)
+        key = _cache_key(request)
+        entry = _get_entry(key)
+        if entry is not None:
+            request.headers["If-None-Match"] = entry["headers"]["ETag"]
+        response = super().send(request, stream=stream, **kwargs)
+        if response.status_code == 304 and entry is not None:
+            response.status_code = 200
+            response.reason = "OK"
+            response.headers.update(entry["headers"])
+            response._content = entry["body"].encode("utf-8")
+            response.encoding = "utf-8"
+        elif _is_cacheable(response):
+            headers = {
+                name: response.headers[name]
+                for name in STORED_HEADERS
+                if name in response.headers
+            }
+            entry = {"headers": headers, "body": response.content.decode("utf-8")}
+            cache.set(key, json.dumps(entry), config.GITHUB_HTTP_CACHE_TTL)
+        elif entry is not None:
+            cache.delete(key)
+        return response
@@ -2,17 +2,34 @@
 # Distributed under the MIT License (http://opensource.org/licenses/MIT).
 
 import ast
+import contextlib
+import json
 import logging
 import os
 import re
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import quote
 
+import appdirs
 import requests
+from requests.adapters import HTTPAdapter
 
-from . import config
-from .github import git_get_current_branch, github_user_can_push
-from .process import check_call, check_output
+from . import config, git_cache
+from .github import github_user_can_push
+from .process import CalledProcessError, check_call, check_output
 
 MANIFEST_NAMES = ("__manifest__.py", "__openerp__.py", "__terp__.py")
+# Sparse checkout patterns (see github.temporary_clone) for tasks that only
+# need to know which addons are modified: files at the repository root,
+# addon manifests, and setup/ links to addons.
+ADDONS_SPARSE_CHECKOUT = [
+    "/*",
+    "!/*/",
+    *(f"/*/{manifest_name}" for manifest_name in MANIFEST_NAMES),
+    "/setup/*/odoo/addons/*",
+    "/setup/*/odoo_addons/*",
+]
 VERSION_RE = re.compile(
     r"^(?P<series>\d+\.\d+)\.(?P<major>\d+)\.(?P<minor>\d+)\.(?P<patch>\d+)$"
 )
@@ -21,8 +38,15 @@ MANIFEST_VERSION_RE = re.compile(
     r"(?P<pre>[\"']version[\"']\s*:\s*[\"'])(?P<version>[\d\.]+)(?P<post>[\"'])"
 )
 
+MAINTAINER_CHECK_WORKERS = 8
+
 _logger = logging.getLogger(__name__)
 
+# shared by the threads looking for maintainers on GitHub, to reuse
+# connections; requests are independent so sharing it is safe
+_raw_session = requests.Session()
+_raw_session.mount("https://", HTTPAdapter(pool_maxsize=MAINTAINER_CHECK_WORKERS))
+
 
 class NoManifestFound(Exception):
     pass
@@ -152,24 +176,107 @@ def bump_manifest_version(addon_dir, mode, git_commit=False):
         )
 
 
-def git_modified_addons(addons_dir, ref):
+def _git_ls_tree_entries(repo_dir, treeish, paths=()):
+    """Return the (mode, sha) of the given paths that exist in treeish.
+
+    Without paths, return the entries at the root of treeish.
     """
-    List addons that have been modified in the current branch compared to
+    entries = check_output(
+        ["git", "ls-tree", "-z", treeish, "--", *paths], cwd=repo_dir
+    )
+    result = {}
+    for entry in entries.split("\0"):
+        if not entry:
+            continue
+        info, path = entry.split("\t", 1)
+        mode, _, sha = info.split(" ")
+        result[path] = (mode, sha)
+    return result
+
+
+def _git_classify_addons(repo_dir, treeish, names, setup_names):
+    """Find which names are Odoo addons in treeish.
+
+    names are directories at the root of treeish, and setup_names are
+    directories in its setup/ directory. Everything is looked up with a
+    single git ls-tree, whatever the number of names.
+
+    Return a tuple with the set of names that are addons, and the set of
+    setup_names that are addon setups (which usually contain a symbolic
+    link to the addon at the root of the repository).
+    """
+    # setup/{name}/{layout}/{name} is the addon of a setup directory
+    setup_layouts = ("odoo_addons", "odoo/addons")
+    paths = []
+    for name in names | setup_names:
+        paths.extend(f"{name}/{manifest_name}" for manifest_name in MANIFEST_NAMES)
+    for name in setup_names:
+        for layout in setup_layouts:
+            link_path = f"setup/{name}/{layout}/{name}"
+            paths.append(link_path)
+            paths.extend(
+                f"{link_path}/{manifest_name}" for manifest_name in MANIFEST_NAMES
+            )
+    modes = {}
+    if paths:
+        modes = {
+            path: mode
+            for path, (mode, _) in _git_ls_tree_entries(
+                repo_dir, treeish, paths
+            ).items()
+        }
+    addons = set()
+    for path in modes:
+        parts = path.split("/")
+        if len(parts) == 2 and parts[1] in MANIFEST_NAMES:
+            addons.add(parts[0])
+    setup_addons = set()
+    for name in setup_names:
+        for layout in setup_layouts:
+            link_path = f"setup/{name}/{layout}/{name}"
+            if modes.get(link_path) == "120000":
+                is_setup = name in addons
+            else:
+                is_setup = any(
+                    f"{link_path}/{manifest_name}" in modes
+                    for manifest_name in MANIFEST_NAMES
+                )
+            if is_setup:
+                setup_addons.add(name)
+                break
+    return addons & names, setup_addons
+
+
+def git_modified_addons(addons_dir, ref, head="HEAD"):
+    """
+    List addons that have been modified in head compared to
     ref, after simulating a merge in ref.
     Deleted addons are not returned.
 
+    The merge is done with git merge-tree, from object data only, so
+    addons_dir can be a checkout or a bare repository, and the working
+    tree is never touched. A merge conflict raises CalledProcessError.
+
     Returns a tuple with a set of modified addons, and a flag telling
     if something else than addons has been modified.
     """
-    modified = set()
-    current_branch = git_get_current_branch(cwd=addons_dir)
-    check_call(["git", "checkout", ref], cwd=addons_dir)
-    check_call(["git", "checkout", "-B", "tmp-git-modified-addons"], cwd=addons_dir)
-    check_call(["git", "merge", current_branch], cwd=addons_dir)
-    diffs = check_output(["git", "diff", "--name-only", ref, "--"], cwd=addons_dir)
-    check_call(["git", "checkout", current_branch], cwd=addons_dir)
+    merged_tree = check_output(
+        ["git", "merge-tree", "--write-tree", "--no-messages", ref, head],
+        cwd=addons_dir,
+    ).split("\n", 1)[0]
+    diffs = check_output(
+        # rename detection, like git diff, so renamed files
+        # are only reported under their new name
+        ["git", "diff-tree", "-r", "-z", "--find-renames", "--name-only"]
+        + [ref, merged_tree, "--"],
+        cwd=addons_dir,
+    )
     other_changes = False
-    for diff in diffs.split("\n"):
+    # group the modified paths by top level directory, so each
+    # directory is classified once however many files it has
+    names = set()
+    setup_names = set()
+    for diff in diffs.split("\0"):
         if not diff:
             continue
         if "/" not in diff:
@@ -177,25 +284,14 @@ def git_modified_addons(addons_dir, ref):
             other_changes = True
             continue
         parts = diff.split("/")
-        if parts[0] == "setup" and len(parts) > 1:
-            addon_name = parts[1]
-            if is_addon_dir(
-                os.path.join(addons_dir, "setup", addon_name, "odoo_addons", addon_name)
-            ) or is_addon_dir(
-                os.path.join(
-                    addons_dir, "setup", addon_name, "odoo", "addons", addon_name
-                )
-            ):
-                modified.add(addon_name)
-            else:
-                other_changes = True
+        if parts[0] == "setup" and len(parts) > 2:
+            setup_names.add(parts[1])
         else:
-            addon_name = parts[0]
-            if is_addon_dir(os.path.join(addons_dir, addon_name)):
-                modified.add(addon_name)
-            else:
-                other_changes = True
-    return modified, other_changes
+            names.add(parts[0])
+    addons, setup_addons = _git_classify_addons(addons_dir, head, names, setup_names)
+    if names - addons or setup_names - setup_addons:
+        other_changes = True
+    return addons | setup_addons, other_changes
 
 
 def git_modified_addon_dirs(addons_dir, ref):
@@ -207,6 +303,328 @@ def git_modified_addon_dirs(addons_dir, ref):
     )
 
 
+# seconds after which an addon index that has not been used is removed
+ADDON_INDEX_MAX_AGE = 7 * 24 * 3600
+# maintainers maps kept in memory, for the most recently used branches
+MAINTAINERS_MAPS_MAX = 64
+
+
+class AddonIndex:
+    """Index of the addons at the root of a git tree.
+
+    It maps addon names to their manifest path (relative to the root of
+    the tree) and parsed manifest, and is built from git objects only, so
+    it does not need a checkout. Indexes are persisted on disk by tree sha,
+    so an index is built once per tree, and loading the index of an
+    unchanged branch costs one git rev-parse and the reading of a small
+    json file.
+    """
+
+    def __init__(self, tree_sha, addons):
+        self.tree_sha = tree_sha
+        # addon name: {"manifest_path": ..., "manifest": ...}
+        self.addons = addons
+
+    def __contains__(self, addon_name):
+        return addon_name in self.addons
+
+    def __bool__(self):
+        return bool(self.addons)
+
+    def addon_names(self, installable_only=False):
+        return sorted(
+            addon_name
+            for addon_name in self.addons
+            if not installable_only or self.is_installable(addon_name)
+        )
+
+    def get_manifest_path(self, addon_name):
+        return self.addons[addon_name]["manifest_path"]
+
+    def get_manifest(self, addon_name):
+        if addon_name not in self.addons:
+            raise NoManifestFound(f"no manifest found for {addon_name}")
+        return self.addons[addon_name]["manifest"]
+
+    def is_installable(self, addon_name):
+        return self.get_manifest(addon_name).get("installable", True)
+
+    def get_maintainers(self, addon_name):
+        return self.get_manifest(addon_name).get("maintainers", [])
+
+    def is_maintainer(self, username, addon_names):
+        """Test if username is maintainer of all addon_names."""
+        for addon_name in addon_names:
+            if addon_name not in self.addons:
+                return False
+            if username not in self.get_maintainers(addon_name):
+                return False
+        return True
+
+    @staticmethod
+    def default_index_dir():
+        return os.path.join(appdirs.user_cache_dir("oca-mqt"), "addon-index")
+
+    @classmethod
+    def from_tree(cls, repo_dir, treeish, index_dir=None, base=None):
+        """Return the AddonIndex of treeish in the git repository repo_dir.
+
+        repo_dir can be a checkout or a bare repository. When the index of
+        treeish is not on disk yet and base is the index of another tree,
+        it is derived from base and the differences between both trees,
+        so only the manifests that changed are parsed.
+        """
+        index_dir = index_dir or cls.default_index_dir()
+        tree_sha = _git_tree_sha(repo_dir, treeish)
+        index = cls._load(index_dir, tree_sha)
+        if index is None:
+            if base is not None:
+                try:
+                    index = cls._update(repo_dir, base, tree_sha)
+                except CalledProcessError:
+                    # the base tree is not in repo_dir anymore (after a force
+                    # push and a gc for instance)
+                    _logger.info("base tree %s not found, indexing", base.tree_sha)
+                    index = cls._build(repo_dir, tree_sha)
+            else:
+                index = cls._build(repo_dir, tree_sha)
+            index._save(index_dir)
+            cls._evict(index_dir)
+        return index
+
+    @classmethod
+    def for_branch(cls, repo_dir, key, treeish, index_dir=None):
+        """Return the AddonIndex of treeish, the head of a branch.
+
+        key identifies the branch, such as ``github.com/{org}/{repo}/{branch}``.
+        The index is derived from the index of the previous head of the
+        same branch, so moving a branch costs as many manifest parsings
+        as there are modified manifests.
+        """
+        index_dir = index_dir or cls.default_index_dir()
+        pointer_path = os.path.join(index_dir, "branches", quote(key, safe=""))
+        base = None
+        try:
+            with open(pointer_path) as f:
+                base = cls._load(index_dir, f.read().strip())
+        except FileNotFoundError:
+            pass
+        index = cls.from_tree(repo_dir, treeish, index_dir, base)
+        if base is None or base.tree_sha != index.tree_sha:
+            os.makedirs(os.path.dirname(pointer_path), exist_ok=True)
+            _write_atomic(pointer_path, index.tree_sha)
+            if base is not None and base.tree_sha not in cls._branch_trees(index_dir):
+                # the previous head is not needed anymore
+                with contextlib.suppress(FileNotFoundError):
+                    os.unlink(os.path.join(index_dir, f"{base.tree_sha}.json"))
+        return index
+
+    @staticmethod
+    def _branch_trees(index_dir):
+        """Return the set of trees that branch pointers refer to."""
+        branches_dir = os.path.join(index_dir, "branches")
+        tree_shas = set()
+        if not os.path.isdir(branches_dir):
+            return tree_shas
+        for name in os.listdir(branches_dir):
+            with contextlib.suppress(FileNotFoundError):
+                with open(os.path.join(branches_dir, name)) as f:
+                    tree_shas.add(f.read().strip())
+        return tree_shas
+
+    @classmethod
+    def _evict(cls, index_dir, max_age=ADDON_INDEX_MAX_AGE):
+        """Remove the indexes that have not been used for max_age seconds.
+
+        Indexes are touched when loaded, so the ones in use are kept.
+        """
+        now = time.time()
+        for name in os.listdir(index_dir):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(index_dir, name)
+            with contextlib.suppress(FileNotFoundError):
+                if now - os.stat(path).st_mtime > max_age:
+                    os.unlink(path)
+
+    @classmethod
+    def _load(cls, index_dir, tree_sha):
+        path = os.path.join(index_dir, f"{tree_sha}.json")
+        try:
+            with open(path) as f:
+                index = cls(tree_sha, json.load(f)["addons"])
+        except (FileNotFoundError, ValueError, KeyError):
+            return None
+        # record the use, for _evict
+        with contextlib.suppress(FileNotFoundError):
+            os.utime(path)
+        return index
+
+    def _save(self, index_dir):
+        os.makedirs(index_dir, exist_ok=True)
+        # manifests may contain tuples or sets, stored as lists
+        _write_atomic(
+            os.path.join(index_dir, f"{self.tree_sha}.json"),
+            json.dumps({"addons": self.addons}, default=list),
+        )
+
+    @classmethod
+    def _build(cls, repo_dir, tree_sha):
+        top_dirs = [
+            path
+            for path, (mode, _) in _git_ls_tree_entries(repo_dir, tree_sha).items()
+            if mode == "040000"
+        ]
+        return cls(tree_sha, _git_read_addons(repo_dir, tree_sha, top_dirs))
+
+    @classmethod
+    def _update(cls, repo_dir, base, tree_sha):
+        diffs = check_output(
+            ["git", "diff-tree", "-r", "-z", "--name-only", base.tree_sha, tree_sha],
+            cwd=repo_dir,
+        )
+        # directories where a manifest was added, modified or removed
+        top_dirs = set()
+        for diff in diffs.split("\0"):
+            parts = diff.split("/")
+            if len(parts) == 2 and parts[1] in MANIFEST_NAMES:
+                top_dirs.add(parts[0])
+        addons = {
+            addon_name: addon
+            for addon_name, addon in base.addons.items()
+            if addon_name not in top_dirs
+        }
+        addons.update(_git_read_addons(repo_dir, tree_sha, top_dirs))
+        return cls(tree_sha, addons)
+
+
+def branch_key(org, repo, branch):
+    """Identify a branch of a GitHub repository, for AddonIndex.for_branch
+    and MaintainersMap.for_branch."""
+    return f"github.com/{org.lower()}/{repo.lower()}/{branch}"
+
+
+class MaintainersMap:
+    """Maintainers of the addons of a branch, at a given commit.
+
+    Maps are kept in memory per branch, and refreshed from the (persistent)
+    AddonIndex of the branch only when the branch head moves. Only the maps
+    of the MAINTAINERS_MAPS_MAX most recently used branches are kept.
+    """
+
+    # branch key: MaintainersMap, least recently used first
+    _maps = {}
+
+    def __init__(self, commit_sha, maintainers, installable):
+        self.commit_sha = commit_sha
+        # addon name: set of maintainers
+        self.maintainers = maintainers
+        self.installable = installable
+
+    @classmethod
+    def from_index(cls, commit_sha, index):
+        return cls(
+            commit_sha,
+            {
+                addon_name: set(index.get_maintainers(addon_name))
+                for addon_name in index.addons
+            },
+            {
+                addon_name
+                for addon_name in index.addons
+                if index.is_installable(addon_name)
+            },
+        )
+
+    @classmethod
+    def for_branch(cls, repo_dir, key, treeish, index_dir=None):
+        """Return the MaintainersMap of treeish, the head of the branch key.
+
+        repo_dir can be a checkout or a bare repository.
+        """
+        commit_sha = check_output(
+            ["git", "rev-parse", "--verify", f"{treeish}^{{commit}}"], cwd=repo_dir
+        ).strip()
+        maintainers_map = cls._maps.pop(key, None)
+        if maintainers_map is None or maintainers_map.commit_sha != commit_sha:
+            index = AddonIndex.for_branch(repo_dir, key, commit_sha, index_dir)
+            maintainers_map = cls.from_index(commit_sha, index)
+        cls._maps[key] = maintainers_map
+        while len(cls._maps) > MAINTAINERS_MAPS_MAX:
+            del cls._maps[next(iter(cls._maps))]
+        return maintainers_map
+
+    def is_maintainer(self, username, addon_names):
+        """Test if username is maintainer of all addon_names."""
+        return all(
+            username in self.maintainers.get(addon_name, ())
+            for addon_name in addon_names
+        )
+
+    def get_maintainers(self, addon_names, installable_only=False):
+        """Return a dictionary mapping addon_names to their maintainers.
+
+        Names that are not addons in the branch are ignored.
+        """
+        return {
+            addon_name: self.maintainers[addon_name]
+            for addon_name in addon_names
+            if addon_name in self.maintainers
+            and (not installable_only or addon_name in self.installable)
+        }
+
+
+def _write_atomic(path, content):
+    # other processes may be reading path
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def _git_tree_sha(repo_dir, treeish):
+    return check_output(
+        ["git", "rev-parse", "--verify", f"{treeish}^{{tree}}"], cwd=repo_dir
+    ).strip()
+
+
+def _git_read_addons(repo_dir, treeish, top_dirs):
+    """Find and parse the manifests of the addons among top_dirs of treeish.
+
+    Return a dictionary mapping addon names to their manifest path
+    and parsed manifest.
+    """
+    if not top_dirs:
+        return {}
+    entries = _git_ls_tree_entries(
+        repo_dir,
+        treeish,
+        [
+            f"{top_dir}/{manifest_name}"
+            for top_dir in top_dirs
+            for manifest_name in MANIFEST_NAMES
+        ],
+    )
+    manifests = {}  # addon name: (manifest path, blob sha)
+    # MANIFEST_NAMES order gives the preferred manifest
+    for manifest_name in reversed(MANIFEST_NAMES):
+        for path, (_, sha) in entries.items():
+            addon_name, file_name = path.split("/")
+            if file_name == manifest_name:
+                manifests[addon_name] = (path, sha)
+    blobs = git_cache.read_blobs(repo_dir, [sha for _, sha in manifests.values()])
+    addons = {}
+    for addon_name, (manifest_path, sha) in manifests.items():
+        try:
+            manifest = parse_manifest(blobs[sha])
+        except Exception:
+            _logger.warning("could not parse %s", manifest_path, exc_info=True)
+            # like an addon that is not installable
+            manifest = {"installable": False}
+        addons[addon_name] = {"manifest_path": manifest_path, "manifest": manifest}
+    return addons
+
+
 def get_odoo_series_from_version(version):
     mo = VERSION_RE.match(version)
     if not mo:
@@ -248,45 +666,89 @@ def user_can_push(gh, org, repo, username, addons_dir, target_branch):
         return False
     # if we are modifying addons only, then the user must be maintainer of
     # all of them on the target branch
-    current_branch = git_get_current_branch(cwd=addons_dir)
-    try:
-        check_call(["git", "checkout", target_branch], cwd=addons_dir)
-        result = is_maintainer(username, modified_addon_dirs)
-    finally:
-        check_call(["git", "checkout", current_branch], cwd=addons_dir)
-
-    if result:
+    target_maintainers = MaintainersMap.for_branch(
+        addons_dir, branch_key(org, repo, target_branch), target_branch
+    )
+    if target_maintainers.is_maintainer(username, modified_addons):
         return True
 
-    other_branches = config.MAINTAINER_CHECK_ODOO_RELEASES
-    if target_branch in other_branches:
-        other_branches.remove(target_branch)
+    other_branches = [
+        branch
+        for branch in config.MAINTAINER_CHECK_ODOO_RELEASES
+        if branch != target_branch
+    ]
 
     return is_maintainer_other_branches(
-        org, repo, username, modified_addons, other_branches
+        org, repo, username, modified_addons, other_branches, repo_dir=addons_dir
     )
 
 
-def is_maintainer_other_branches(org, repo, username, modified_addons, other_branches):
-    for addon in modified_addons:
-        is_maintainer = False
-        for branch in other_branches:
-            manifest_file = (
-                "__openerp__.py" if float(branch) < 10.0 else "__manifest__.py"
-            )
-            url = (
-                f"https://github.com/{org}/{repo}/raw/{branch}/{addon}/{manifest_file}"
-            )
-            _logger.debug("Looking for maintainers in %s", url)
-            r = requests.get(
-                url, allow_redirects=True, headers={"Cache-Control": "no-cache"}
-            )
-            if r.ok:
-                manifest = parse_manifest(r.content)
-                if username in manifest.get("maintainers", []):
-                    is_maintainer = True
-                    break
+def _is_maintainer_raw(session, org, repo, username, addon, branch):
+    manifest_file = "__openerp__.py" if float(branch) < 10.0 else "__manifest__.py"
+    url = f"https://github.com/{org}/{repo}/raw/{branch}/{addon}/{manifest_file}"
+    _logger.debug("Looking for maintainers in %s", url)
+    r = session.get(url, allow_redirects=True, headers={"Cache-Control": "no-cache"})
+    if r.ok:
+        manifest = parse_manifest(r.content)
+        return username in manifest.get("maintainers", [])
+    return False
 
-        if not is_maintainer:
-            return False
-    return True
+
+def is_maintainer_other_branches(
+    org, repo, username, modified_addons, other_branches, repo_dir=None
+):
+    """Test if username is maintainer of each addon in at least one branch.
+
+    When repo_dir is a git clone of the repository, the other branches are
+    first looked up in it (as ``origin/{branch}``). Branches that are not
+    available locally are read from GitHub, concurrently, stopping as soon
+    as the result is known.
+    """
+    # addon: branches still to check
+    pending = {addon: list(other_branches) for addon in modified_addons}
+    if repo_dir:
+        for branch in other_branches:
+            try:
+                index = AddonIndex.from_tree(repo_dir, f"origin/{branch}")
+            except CalledProcessError:
+                # branch not fetched
+                continue
+            for addon in list(pending):
+                if index.is_maintainer(username, [addon]):
+                    del pending[addon]
+                else:
+                    pending[addon].remove(branch)
+    if not pending:
+        return True
+    if any(not branches for branches in pending.values()):
+        return False
+    executor = ThreadPoolExecutor(max_workers=MAINTAINER_CHECK_WORKERS)
+    try:
+        futures = {
+            executor.submit(
+                _is_maintainer_raw, _raw_session, org, repo, username, addon, branch
+            ): addon
+            for addon, branches in pending.items()
+            for branch in branches
+        }
+        remaining = {addon: len(branches) for addon, branches in pending.items()}
+        for future in as_completed(futures):
+            addon = futures[future]
+            if addon not in remaining:
+                # already proven
+                continue
+            if future.result():
+                del remaining[addon]
+                for other_future, other_addon in futures.items():
+                    if other_addon == addon:
+                        other_future.cancel()
+                if not remaining:
+                    return True
+            else:
+                remaining[addon] -= 1
+                if not remaining[addon]:
+                    # not maintainer in any branch
+                    return False
+    finally:
+        # do not wait for lookups whose result does not matter anymore
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,278 @@
+# Copyright (c) ACSONE SA/NV 2026
+# Distributed under the MIT License (http://opensource.org/licenses/MIT).
+
+"""State of a pull request, loaded with one GitHub GraphQL query.
+
+With the REST API, deciding what to do with a pull request takes a call for
+the pull request, one per page of reviews, one for the issue, one for its
+labels, one for the commit status and one per page of check suites. The
+rare pull requests with more reviews, labels or check suites than fit in
+one page need more queries, one per additional page.
+"""
+
+from datetime import datetime
+
+from . import github
+
+# reviews, labels and check suites loaded per query
+PAGE_SIZE = 100
+
+# comments don't change the review state, so they are not loaded
+_REVIEW_STATES = "[APPROVED, CHANGES_REQUESTED, DISMISSED]"
+
+_PAGE_INFO = "pageInfo { hasNextPage endCursor hasPreviousPage startCursor }"
+
+_CHECK_SUITES = f"""
+checkSuites(first: {PAGE_SIZE}, after: $after) {{
+  {_PAGE_INFO}
+  nodes {{
+    app {{ name }}
+    conclusion
+    checkRuns(first: 1) {{ totalCount }}
+  }}
+}}
+"""
+
+_REVIEWS = f"""
+reviews(last: {PAGE_SIZE}, before: $before, states: {_REVIEW_STATES}) {{
+  {_PAGE_INFO}
+  nodes {{ state author {{ login }} }}
+}}
+"""
+
+_LABELS = f"""
+labels(first: {PAGE_SIZE}, after: $after) {{
+  {_PAGE_INFO}
+  nodes {{ name }}
+}}
+"""
+
+_COMMIT_CHECKS = f"""
+fragment commitChecks on Commit {{
+  oid
+  statusCheckRollup {{ state }}
+  status {{ contexts {{ context state }} }}
+  {_CHECK_SUITES}
+}}
+"""
+
+_PR_SNAPSHOT_QUERY = (
+    _COMMIT_CHECKS
+    + f"""
+query prSnapshot(
+  $owner: String!, $name: String!, $number: Int!,
+  $ref: String!, $withRef: Boolean!, $sha: GitObjectID!, $withSha: Boolean!,
+  $after: String, $before: String
+) {{
+  repository(owner: $owner, name: $name) {{
+    ref(qualifiedName: $ref) @include(if: $withRef) {{ target {{ oid }} }}
+    object(oid: $sha) @include(if: $withSha) {{ ...commitChecks }}
+    pullRequest(number: $number) {{
+      url
+      title
+      state
+      createdAt
+      mergeable
+      headRefOid
+      {_LABELS}
+      {_REVIEWS}
+      commits(last: 1) {{ nodes {{ commit {{ ...commitChecks }} }} }}
+    }}
+  }}
+}}
+"""
+)
+
+_REVIEWS_QUERY = f"""
+query prReviews($owner: String!, $name: String!, $number: Int!, $before: String) {{
+  repository(owner: $owner, name: $name) {{
+    pullRequest(number: $number) {{ {_REVIEWS} }}
+  }}
+}}
+"""
+
+_LABELS_QUERY = f"""
+query prLabels($owner: String!, $name: String!, $number: Int!, $after: String) {{
+  repository(owner: $owner, name: $name) {{
+    pullRequest(number: $number) {{ {_LABELS} }}
+  }}
+}}
+"""
+
+_CHECK_SUITES_QUERY = f"""
+query checkSuites(
+  $owner: String!, $name: String!, $sha: GitObjectID!, $after: String
+) {{
+  repository(owner: $owner, name: $name) {{
+    object(oid: $sha) {{ ... on Commit {{ {_CHECK_SUITES} }} }}
+  }}
+}}
+"""
+
+_MERGEABLE = {"MERGEABLE": True, "CONFLICTING": False}
+
+
+class Status:
+    """A commit status, with the attributes of the REST API."""
+
+    def __init__(self, context, state):
+        self.context = context
+        # expected is a required status that has not been reported yet
+        self.state = "pending" if state == "EXPECTED" else state.lower()
+
+
+class CheckSuite:
+    """A check suite, with the attributes of the REST API."""
+
+    def __init__(self, app_name, conclusion, check_runs_count):
+        self.app_name = app_name
+        self.conclusion = conclusion.lower() if conclusion else None
+        self.check_runs_count = check_runs_count
+
+
+class CommitChecks:
+    """The commit statuses and check suites of a commit.
+
+    state is the combined state of all statuses and checks (success,
+    pending, failure, error or expected), None if there are none.
+    """
+
+    def __init__(self, data):
+        self.sha = data["oid"]
+        rollup = data["statusCheckRollup"]
+        self.state = rollup["state"].lower() if rollup else None
+        self.statuses = [
+            Status(context["context"], context["state"])
+            for context in (data["status"] or {}).get("contexts", [])
+        ]
+        self.check_suites = [
+            CheckSuite(
+                (suite["app"] or {}).get("name"),
+                suite["conclusion"],
+                suite["checkRuns"]["totalCount"],
+            )
+            for suite in data["checkSuites"]["nodes"]
+        ]
+
+
+class PullRequestSnapshot:
+    """What the bot needs to know about a pull request.
+
+    Attributes:
+
+    - url, title, state (open, closed or merged), head_sha
+    - created_at: naive UTC datetime
+    - mergeable: True, False, or None when GitHub is still computing it
+    - labels: set of label names
+    - review_state_by_user: last review state (APPROVED, CHANGES_REQUESTED
+      or DISMISSED) by reviewer login, ignoring comments
+    - checks: CommitChecks of the head of the pull request, or of the
+      commit requested with sha
+    - branch_sha: head of the branch requested with branch, None if it
+      does not exist
+    """
+
+    def __init__(self, data):
+        self.url = data["url"]
+        self.title = data["title"]
+        self.state = data["state"].lower()
+        self.created_at = datetime.strptime(data["createdAt"], "%Y-%m-%dT%H:%M:%SZ")
+        self.head_sha = data["headRefOid"]
+        self.mergeable = _MERGEABLE.get(data["mergeable"])
+        self.labels = {label["name"] for label in data["labels"]["nodes"]}
+        self.review_state_by_user = {}
+        for review in data["reviews"]["nodes"]:
+            if not review["author"]:
+                # deleted user
+                continue
+            self.review_state_by_user[review["author"]["login"]] = review["state"]
+        commits = data["commits"]["nodes"]
+        self.checks = CommitChecks(commits[0]["commit"]) if commits else None
+        self.branch_sha = None
+
+    def reviewers(self, state):
+        """Return the set of logins of reviewers whose last review is state."""
+        return {
+            login
+            for login, user_state in self.review_state_by_user.items()
+            if user_state == state
+        }
+
+
+def _all_nodes(gh, connection, query, path, backward=False, **variables):
+    """Return the nodes of all pages of a GraphQL connection.
+
+    connection is the first page (the last one when backward is True), and
+    query loads the others, given the cursor in its after (or before)
+    variable; path is the list of keys leading to the connection in its
+    result.
+    """
+    nodes = connection["nodes"]
+    page_info = connection["pageInfo"]
+    while page_info["hasPreviousPage" if backward else "hasNextPage"]:
+        if backward:
+            variables["before"] = page_info["startCursor"]
+        else:
+            variables["after"] = page_info["endCursor"]
+        page = github.graphql(gh, query, **variables)
+        for key in path:
+            page = page[key]
+        nodes = page["nodes"] + nodes if backward else nodes + page["nodes"]
+        page_info = page["pageInfo"]
+    return nodes
+
+
+def _load_check_suites(gh, org, repo, commit):
+    commit["checkSuites"]["nodes"] = _all_nodes(
+        gh,
+        commit["checkSuites"],
+        _CHECK_SUITES_QUERY,
+        ["repository", "object", "checkSuites"],
+        owner=org,
+        name=repo,
+        sha=commit["oid"],
+    )
+
+
+def load_pr_snapshot(gh, org, repo, pr, branch=None, sha=None):
+    """Load a PullRequestSnapshot of pull request pr of org/repo.
+
+    When sha is given, the checks of the snapshot are the ones of that
+    commit instead of the head of the pull request. When branch is given,
+    its head is loaded as the branch_sha of the snapshot.
+    """
+    data = github.graphql(
+        gh,
+        _PR_SNAPSHOT_QUERY,
+        owner=org,
+        name=repo,
+        number=int(pr),
+        ref=f"refs/heads/{branch}" if branch else "",
+        withRef=bool(branch),
+        sha=sha or "0" * 40,
+        withSha=bool(sha),
+    )["repository"]
+    pr_data = data["pullRequest"]
+    pr_variables = dict(owner=org, name=repo, number=int(pr))
+    pr_path = ["repository", "pullRequest"]
+    pr_data["reviews"]["nodes"] = _all_nodes(
+        gh,
+        pr_data["reviews"],
+        _REVIEWS_QUERY,
+        pr_path + ["reviews"],
+        backward=True,
+        **pr_variables,
+    )
+    pr_data["labels"]["nodes"] = _all_nodes(
+        gh, pr_data["labels"], _LABELS_QUERY, pr_path + ["labels"], **pr_variables
+    )
+    for commit in pr_data["commits"]["nodes"]:
+        _load_check_suites(gh, org, repo, commit["commit"])
+    if sha and data["object"]:
+        _load_check_suites(gh, org, repo, data["object"])
+    snapshot = PullRequestSnapshot(pr_data)
+    if branch and data["ref"]:
+        snapshot.branch_sha = data["ref"]["target"]["oid"]
+    if sha:
+        snapshot.checks = CommitChecks(data["object"]) if data["object"] else None
+    return snapshot
@@ -1,16 +1,219 @@
 # Copyright (c) ACSONE SA/NV 2018
 # Distributed under the MIT License (http://opensource.org/licenses/MIT).
 
+import asyncio
+import contextvars
+import functools
+import hashlib
+import json
+import logging
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
 import celery
 from celery.utils.log import get_task_logger
 
-from . import config
+from . import cache, config
+
+_logger = logging.getLogger(__name__)
+
+# list where tasks are collected instead of being published, if set
+_collected_publishes = contextvars.ContextVar("collected_publishes", default=None)
+
+
+# keyword argument carrying the debounce token of a task
+DEBOUNCE_TOKEN = "_debounce_token"
+# seconds the debounce token of a task is kept, longer than its wait in queue
+DEBOUNCE_TOKEN_TTL = 3600
+# message header of low priority tasks, set on the tasks queued by low
+# priority tasks, or when queuing a task that is not always low priority
+LOW_PRIORITY_HEADER = "low_priority"
+
+
+def _task_key(kind, task_name, args, kwargs):
+    call = json.dumps([args or [], kwargs or {}], sort_keys=True, default=str)
+    return f"{kind}:{task_name}:{hashlib.sha1(call.encode()).hexdigest()}"
+
+
+def dedup_key(task_name, args, kwargs):
+    """Key identifying a task with given arguments, to detect duplicates."""
+    return _task_key("pending", task_name, args, kwargs)
+
+
+def debounce_key(task_name, args, kwargs):
+    """Key holding the token of the last queued task with given arguments."""
+    return _task_key("debounce", task_name, args, kwargs)
+
+
+class BotTask(celery.Task):
+    # Number of seconds a task waits before running. Queuing it again with
+    # the same arguments during that time replaces it, so the task runs
+    # once, after things have settled. Set with @task(debounce=...).
+    debounce = 0
+    # True for tasks that modify the git repository given by their org and
+    # repo arguments, to run them in the lane of the repository when
+    # GIT_LANES is set (see route_task). Set with @task(lane=True).
+    lane = False
+    # True for background tasks, such as nightly ones, which must leave
+    # the GitHub API rate limit budget to the others (see github.gh_call).
+    # Tasks they queue are low priority too. Set with @task(low_priority=True).
+    low_priority = False
+
+    def __call__(self, *args, **kwargs):
+        token = kwargs.pop(DEBOUNCE_TOKEN, None)
+        if not self.request.called_directly:
+            # the task starts, so an identical one queued from now on will
+            # see changes that this one may miss, and is not a duplicate
+            cache.delete(dedup_key(self.name, args, kwargs))
+        if token is not None:
+            last_token = cache.get(debounce_key(self.name, args, kwargs))
+            if last_token is not None and last_token != token:
+                _logger.info("%s%s replaced by a later one", self.name, args)
+                return None
+        return super().__call__(*args, **kwargs)
+
+    def _debounced(self, args, kwargs, options):
+        """Return kwargs and options to publish a debounced task."""
+        kwargs = dict(kwargs or {})
+        kwargs.pop(DEBOUNCE_TOKEN, None)
+        token = celery.uuid()
+        cache.set(debounce_key(self.name, args, kwargs), token, DEBOUNCE_TOKEN_TTL)
+        kwargs[DEBOUNCE_TOKEN] = token
+        if "countdown" not in options and "eta" not in options:
+            options = dict(options, countdown=self.debounce)
+        return kwargs, options
+
+    def apply_async(self, args=None, kwargs=None, task_id=None, **options):
+        current_task = celery.current_task
+        if current_task and is_low_priority(current_task):
+            options["headers"] = {
+                LOW_PRIORITY_HEADER: True,
+                **(options.get("headers") or {}),
+            }
+        publishes = _collected_publishes.get()
+        if publishes is None:
+            if self.debounce:
+                kwargs, options = self._debounced(args, kwargs, options)
+            return super().apply_async(args, kwargs, task_id=task_id, **options)
+        task_id = task_id or celery.uuid()
+        publishes.append((self, args, kwargs, dict(options, task_id=task_id)))
+        return self.AsyncResult(task_id)
+
+
+def is_low_priority(task):
+    """Tell if task, being executed, is low priority: declared with
+    @task(low_priority=True), or queued with the LOW_PRIORITY_HEADER."""
+    if task.request.called_directly:
+        return False
+    headers = task.request.headers or {}
+    return bool(
+        getattr(task, "low_priority", False) or headers.get(LOW_PRIORITY_HEADER)
+    )
+
+
+@contextmanager
+def collect_publishes():
+    """Collect the tasks queued in this context instead of publishing them.
+
+    Yield the list of collected tasks, to be published with publish_batch.
+    """
+    publishes = []
+    token = _collected_publishes.set(publishes)
+    try:
+        yield publishes
+    finally:
+        _collected_publishes.reset(token)
+
+
+def publish_batch(publishes):
+    """Publish tasks collected by collect_publishes, with one connection.
+
+    Tasks identical to a task that is already queued and not started yet
+    (within WEBHOOK_DEDUP_TTL seconds) are not published. Debounced tasks
+    are published anyway, since they replace the queued one. If publishing
+    fails, the tasks that were not published can be published again.
+    """
+    if not publishes:
+        return
+    dedup_keys = [
+        dedup_key(bot_task.name, args, kwargs)
+        for bot_task, args, kwargs, _ in publishes
+        if not bot_task.debounce
+    ]
+    added = cache.add_many(dedup_keys, config.WEBHOOK_DEDUP_TTL)
+    new_keys = {
+        key for key, key_added in zip(dedup_keys, added, strict=False) if key_added
+    }
+    seen = set()
+    try:
+        with app.producer_or_acquire() as producer:
+            for bot_task, args, kwargs, options in publishes:
+                key = dedup_key(bot_task.name, args, kwargs)
+                if key in seen or (not bot_task.debounce and key not in new_keys):
+                    _logger.info("not queuing duplicate %s%s", bot_task.name, args)
+                    continue
+                if bot_task.debounce:
+                    kwargs, options = bot_task._debounced(args, kwargs, options)
+                celery.Task.apply_async(
+                    bot_task, args, kwargs, producer=producer, **options
+                )
+                seen.add(key)
+    except Exception:
+        # the tasks not published are not queued, they are not duplicates
+        cache.delete_many(list(new_keys - seen))
+        raise
+
+
+def lane_queue(org, repo):
+    """Name of the queue of the lane where tasks of org/repo run."""
+    lane = zlib.crc32(f"{org}/{repo}".lower().encode("utf-8")) % config.GIT_LANES
+    return f"git-lane-{lane}"
+
+
+def route_task(name, args, kwargs, options, task=None, **kw):
+    """Route lane tasks to the lane of their repository.
+
+    All tasks modifying the git repository of org/repo go to the same
+    queue, consumed by a single worker process, so they run one after the
+    other instead of competing to push, while tasks of other repositories
+    run in parallel in other lanes.
+    """
+    if not config.GIT_LANES or not getattr(task, "lane", False):
+        return None
+    org = args[0] if args else kwargs["org"]
+    repo = args[1] if args and len(args) > 1 else kwargs["repo"]
+    return {"queue": lane_queue(org, repo)}
+
+
+# threads publishing tasks for enqueue, as many as the connections
+# of the broker connection pool (broker_pool_limit)
+_publish_executor = ThreadPoolExecutor(max_workers=10, thread_name_prefix="publish")
+
+
+async def enqueue(task, *args, **kwargs):
+    """Queue task, like task.delay(*args, **kwargs), from a coroutine.
+
+    The broker is never called from the event loop: tasks are either
+    collected (see collect_publishes), or published from a thread.
+    task can be any object with a delay method.
+    """
+    if _collected_publishes.get() is not None:
+        # no I/O, the task is collected
+        return task.delay(*args, **kwargs)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _publish_executor, functools.partial(task.delay, *args, **kwargs)
+    )
+
 
 app = celery.Celery(
     broker=config.BROKER_URI,
     broker_connection_retry_on_startup=True,
     broker_conn_retry=True,
+    task_cls=BotTask,
 )
+app.conf.task_routes = (route_task,)
 
 getLogger = get_task_logger
 
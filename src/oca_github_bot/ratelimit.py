@@ -0,0 +1,79 @@
+# Copyright (c) ACSONE SA/NV 2026
+# Distributed under the MIT License (http://opensource.org/licenses/MIT).
+
+"""GitHub API rate limit budget, shared by the workers through the cache.
+
+The rate limit headers of every GitHub API response are recorded, so tasks
+know the remaining budget before calling GitHub instead of finding out from
+a 403 response. Low priority tasks leave GITHUB_RATE_LIMIT_RESERVE requests
+to the others, and all tasks hold off while GitHub asks to (Retry-After of
+secondary rate limits).
+"""
+
+import time
+from email.utils import parsedate_to_datetime
+
+from . import cache, config
+
+RETRY_AFTER_KEY = "ratelimit:retry-after"
+
+
+def _budget_key(resource):
+    return f"ratelimit:{resource}"
+
+
+def retry_delay(response):
+    """Return the number of seconds to wait before retrying a failed request.
+
+    Return None if the request did not fail because of a rate limit.
+    """
+    if response is None:
+        return None
+    retry_after = response.headers.get("Retry-After")
+    if retry_after is not None:
+        if retry_after.isdigit():
+            return int(retry_after)
+        try:
+            retry_at = parsedate_to_datetime(retry_after).timestamp()
+        except (TypeError, ValueError):
+            return None
+        return max(int(retry_at - time.time()), 0) + 1
+    remaining = response.headers.get("X-RateLimit-Remaining")
+    if remaining is not None and int(remaining) == 0:
+        reset = int(response.headers.get("X-RateLimit-Reset", 0))
+        return max(reset - int(time.time()), 0) + 1
+    return None
+
+
+def record_response(response, *args, **kwargs):
+    """Record the rate limit state of a GitHub response (a requests hook)."""
+    headers = response.headers
+    remaining = headers.get("X-RateLimit-Remaining")
+    reset = headers.get("X-RateLimit-Reset")
+    if remaining is not None and reset is not None:
+        ttl = int(reset) - int(time.time())
+        if ttl > 0:
+            resource = headers.get("X-RateLimit-Resource", "core")
+            cache.set(_budget_key(resource), f"{remaining} {reset}", ttl)
+    if "Retry-After" in headers:
+        delay = retry_delay(response)
+        if delay:
+            cache.set(RETRY_AFTER_KEY, str(time.time() + delay), delay)
+
+
+def wait_time(low_priority=False, resource="core"):
+    """Return the number of seconds to wait before calling the GitHub API.
+
+    Return 0 if it can be called now.
+    """
+    now = time.time()
+    retry_at = cache.get(RETRY_AFTER_KEY)
+    if retry_at is not None and float(retry_at) > now:
+        return int(float(retry_at) - now) + 1
+    budget = cache.get(_budget_key(resource))
+    if budget is not None:
+        remaining, reset = (int(v) for v in budget.split())
+        reserve = config.GITHUB_RATE_LIMIT_RESERVE if low_priority else 0
+        if remaining <= reserve and reset > now:
+            return int(reset - now) + 1
+    return 0
@@ -2,8 +2,8 @@
 # Distributed under the MIT License (http://opensource.org/licenses/MIT).
 
 from .. import github
-from ..config import MODULE_LABEL_COLOR, switchable
-from ..manifest import git_modified_addons
+from ..config import MODULE_LABEL_COLOR, TASK_DEBOUNCE_DELAY, switchable
+from ..manifest import ADDONS_SPARSE_CHECKOUT, git_modified_addons
 from ..process import check_call
 from ..queue import task
 from ..utils import compute_module_label_name
@@ -15,12 +15,17 @@ def _label_modified_addons(gh, org, repo, pr, dry_run):
     gh_pr = gh.pull_request(org, repo, pr)
     target_branch = gh_pr.base.ref
     pr_branch = f"tmp-pr-{pr}"
-    with github.temporary_clone(org, repo, target_branch) as clone_dir:
+    with github.temporary_clone(
+        org,
+        repo,
+        target_branch,
+        extra_refs=[f"refs/pull/{pr}/head"],
+        sparse=ADDONS_SPARSE_CHECKOUT,
+    ) as clone_dir:
         check_call(
-            ["git", "fetch", "origin", f"pull/{pr}/head:{pr_branch}"],
+            ["git", "checkout", "-B", pr_branch, f"origin/pull/{pr}/head"],
             cwd=clone_dir,
         )
-        check_call(["git", "checkout", pr_branch], cwd=clone_dir)
         modified_addons, _ = git_modified_addons(clone_dir, target_branch)
         if not modified_addons:
             return
@@ -55,7 +60,7 @@ def _label_modified_addons(gh, org, repo, pr, dry_run):
             github.gh_call(gh_issue.replace_labels, list(new_labels))
 
 
-@task()
+@task(debounce=TASK_DEBOUNCE_DELAY)
 @switchable("label_modified_addons")
 def label_modified_addons(org, repo, pr, dry_run=False):
     with github.login() as gh:
@@ -121,16 +121,23 @@ def main_branch_bot_actions(org, repo, branch, cwd):
         _setuptools_odoo_make_default(org, repo, branch, cwd)
 
 
-@task()
+@task(lane=True)
 def main_branch_bot(org, repo, branch, build_wheels, dry_run=False):
     if not is_main_branch_bot_branch(branch):
         return
     with github.repository(org, repo) as gh_repo:
         if gh_repo.fork:
             return
-    with temporary_clone(org, repo, branch) as clone_dir:
-        if not manifest.is_addons_dir(clone_dir):
-            return
+    # look for addons in the git cache, before paying for a checkout
+    repo_cache_dir = github.fetch_repo_cache(org, repo, branch)
+    addon_index = manifest.AddonIndex.for_branch(
+        repo_cache_dir,
+        manifest.branch_key(org, repo, branch),
+        f"refs/heads/{branch}",
+    )
+    if not addon_index:
+        return
+    with temporary_clone(org, repo, branch, fetch=False) as clone_dir:
         main_branch_bot_actions(org, repo, branch, clone_dir)
         # push changes to git, if any
         if dry_run:
@@ -147,13 +154,13 @@ def main_branch_bot(org, repo, branch, build_wheels, dry_run=False):
             )
 
 
-@task()
+@task(low_priority=True)
 def main_branch_bot_all_repos(org, build_wheels, dry_run=False):
     with github.login() as gh:
-        for repo in gh.repositories_by(org):
+        for repo in github.gh_call(list, gh.repositories_by(org)):
             if repo.fork:
                 continue
-            for branch in repo.branches():
+            for branch in github.gh_call(list, repo.branches()):
                 if not is_main_branch_bot_branch(branch.name):
                     continue
                 main_branch_bot.delay(
@@ -4,8 +4,10 @@
 from .. import config, github
 from ..config import switchable
 from ..manifest import (
-    addon_dirs_in,
-    get_manifest,
+    ADDONS_SPARSE_CHECKOUT,
+    MaintainersMap,
+    branch_key,
+    get_addon_name,
     git_modified_addon_dirs,
     is_addon_dir,
 )
@@ -21,18 +23,24 @@ def mention_maintainer(org, repo, pr, dry_run=False):
     with github.login() as gh:
         gh_pr = gh.pull_request(org, repo, pr)
         target_branch = gh_pr.base.ref
-        with github.temporary_clone(org, repo, target_branch) as clonedir:
+        with github.temporary_clone(
+            org,
+            repo,
+            target_branch,
+            extra_refs=[f"refs/pull/{pr}/head"],
+            sparse=ADDONS_SPARSE_CHECKOUT,
+        ) as clonedir:
             # Get maintainers existing before the PR changes
-            addon_dirs = addon_dirs_in(clonedir, installable_only=True)
-            maintainers_dict = get_maintainers(addon_dirs)
+            maintainers_map = MaintainersMap.for_branch(
+                clonedir, branch_key(org, repo, target_branch), "HEAD"
+            )
 
             # Get list of addons modified in the PR.
             pr_branch = f"tmp-pr-{pr}"
             check_call(
-                ["git", "fetch", "origin", f"refs/pull/{pr}/head:{pr_branch}"],
+                ["git", "checkout", "-B", pr_branch, f"origin/pull/{pr}/head"],
                 cwd=clonedir,
             )
-            check_call(["git", "checkout", pr_branch], cwd=clonedir)
             modified_addon_dirs, _, _ = git_modified_addon_dirs(clonedir, target_branch)
 
             # Remove not installable addons
@@ -41,10 +49,10 @@ def mention_maintainer(org, repo, pr, dry_run=False):
                 d for d in modified_addon_dirs if is_addon_dir(d, installable_only=True)
             ]
 
-        modified_addons_maintainers = set()
-        for modified_addon in modified_addon_dirs:
-            addon_maintainers = maintainers_dict.get(modified_addon, list())
-            modified_addons_maintainers.update(addon_maintainers)
+        maintainers_dict = maintainers_map.get_maintainers(
+            [get_addon_name(d) for d in modified_addon_dirs], installable_only=True
+        )
+        modified_addons_maintainers = set().union(*maintainers_dict.values())
 
         pr_opener = gh_pr.user.login
         if modified_addon_dirs and not modified_addons_maintainers:
@@ -81,15 +89,3 @@ def get_adopt_mention(pr_opener):
     if config.ADOPT_AN_ADDON_MENTION:
         return config.ADOPT_AN_ADDON_MENTION.format(pr_opener=pr_opener)
     return None
-
-
-def get_maintainers(addon_dirs):
-    """Get maintainer for each addon in `addon_dirs`.
-
-    :return: Dictionary {'addon_dir': <list of addon's maintainers>}
-    """
-    addon_maintainers_dict = dict()
-    for addon_dir in addon_dirs:
-        maintainers = get_manifest(addon_dir).get("maintainers", [])
-        addon_maintainers_dict.setdefault(addon_dir, maintainers)
-    return addon_maintainers_dict
@@ -22,6 +22,7 @@ from ..manifest import (
     is_addon_dir,
     user_can_push,
 )
+from ..pr_snapshot import load_pr_snapshot
 from ..process import CalledProcessError, call, check_call
 from ..queue import getLogger, task
 from ..utils import cmd_to_str, hide_secrets
@@ -56,14 +57,20 @@ def _git_delete_branch(remote, branch, cwd):
             raise
 
 
-def _remove_merging_label(github, gh_pr, dry_run=False):
-    gh_issue = github.gh_call(gh_pr.issue)
-    labels = [label.name for label in gh_issue.labels()]
+def _remove_merging_label(github, gh_pr, dry_run=False, labels=None):
+    """Remove the merging label from gh_pr.
+
+    labels are the labels of the PR, if already known (from a snapshot).
+    """
+    if labels is None:
+        gh_issue = github.gh_call(gh_pr.issue)
+        labels = [label.name for label in gh_issue.labels()]
     if LABEL_MERGING in labels:
         if dry_run:
             _logger.info(f"DRY-RUN remove {LABEL_MERGING} label from PR {gh_pr.url}")
         else:
             _logger.info(f"remove {LABEL_MERGING} label from PR {gh_pr.url}")
+            gh_issue = github.gh_call(gh_pr.issue)
             github.gh_call(gh_issue.remove_label, LABEL_MERGING)
 
 
@@ -130,8 +137,9 @@ def _merge_bot_merge_pr(org, repo, merge_bot_branch, cwd, dry_run=False):
     # version only on addons visibly modified on the PR, and not on
     # other addons that may be modified by the bot for reasons unrelated
     # to the PR.
-    check_call(["git", "fetch", "origin", f"refs/pull/{pr}/head:tmp-pr-{pr}"], cwd=cwd)
-    check_call(["git", "checkout", f"tmp-pr-{pr}"], cwd=cwd)
+    check_call(
+        ["git", "checkout", "-B", f"tmp-pr-{pr}", f"origin/pull/{pr}/head"], cwd=cwd
+    )
     modified_addon_dirs, _, _ = git_modified_addon_dirs(cwd, target_branch)
     check_call(["git", "checkout", merge_bot_branch], cwd=cwd)
 
@@ -237,7 +245,7 @@ def _prepare_merge_bot_branch(
     check_call(["git", "merge", "--no-ff", "-m", msg, pr_branch], cwd=cwd)
 
 
-@task()
+@task(lane=True)
 @switchable("merge_bot")
 def merge_bot_start(
     org,
@@ -257,13 +265,14 @@ def merge_bot_start(
         )
         pr_branch = f"tmp-pr-{pr}"
         try:
-            with github.temporary_clone(org, repo, target_branch) as clone_dir:
+            with github.temporary_clone(
+                org, repo, target_branch, extra_refs=[f"refs/pull/{pr}/head"]
+            ) as clone_dir:
                 # create merge bot branch from PR and rebase it on target branch
                 check_call(
-                    ["git", "fetch", "origin", f"pull/{pr}/head:{pr_branch}"],
+                    ["git", "checkout", "-B", pr_branch, f"origin/pull/{pr}/head"],
                     cwd=clone_dir,
                 )
-                check_call(["git", "checkout", pr_branch], cwd=clone_dir)
                 if not user_can_push(gh, org, repo, username, clone_dir, target_branch):
                     github.gh_call(
                         gh_pr.create_comment,
@@ -328,11 +337,10 @@ def merge_bot_start(
             github.gh_call(gh_issue.add_labels, LABEL_MERGING)
 
 
-def _get_commit_success(org, repo, pr, gh_commit):
-    """Test commit status, using both status and check suites APIs"""
+def _get_commit_success(org, repo, pr, checks):
+    """Test commit status, using both statuses and check suites of checks"""
     success = None  # None means don't know / in progress
-    gh_status = github.gh_call(gh_commit.status)
-    for status in gh_status.statuses:
+    for status in checks.statuses:
         if status.context in GITHUB_STATUS_IGNORED:
             # ignore
             _logger.info(
@@ -356,72 +364,79 @@ def _get_commit_success(org, repo, pr, gh_commit):
                 f"PR #{pr} of {org}/{repo}"
             )
             return False
-    gh_check_suites = github.gh_call(gh_commit.check_suites)
-    for check_suite in gh_check_suites:
-        if check_suite.app.name in GITHUB_CHECK_SUITES_IGNORED:
+    for check_suite in checks.check_suites:
+        if check_suite.app_name in GITHUB_CHECK_SUITES_IGNORED:
             # ignore
             _logger.info(
-                f"Ignoring check suite {check_suite.app.name} for "
+                f"Ignoring check suite {check_suite.app_name} for "
                 f"PR #{pr} of {org}/{repo}"
             )
             continue
         if check_suite.conclusion == "success":
             _logger.info(
-                f"Successful check suite {check_suite.app.name} for "
+                f"Successful check suite {check_suite.app_name} for "
                 f"PR #{pr} of {org}/{repo}"
             )
             success = True
         elif check_suite.conclusion == "skipped":
             # skipped
             _logger.info(
-                f"Ignoring skipped check suite {check_suite.app.name} for "
+                f"Ignoring skipped check suite {check_suite.app_name} for "
                 f"PR #{pr} of {org}/{repo}"
             )
             continue
         elif not check_suite.conclusion:
             # not complete
-            check_runs = list(github.gh_call(check_suite.check_runs))
-            if not check_runs:
+            if not check_suite.check_runs_count:
                 _logger.info(
-                    f"Ignoring check suite {check_suite.app.name} "
+                    f"Ignoring check suite {check_suite.app_name} "
                     f"that has no check runs for "
                     f"PR #{pr} of {org}/{repo}"
                 )
                 continue
             _logger.info(
-                f"Pending check suite {check_suite.app.name} for "
+                f"Pending check suite {check_suite.app_name} for "
                 f"PR #{pr} of {org}/{repo}"
             )
             return None
         else:
             _logger.info(
-                f"Unsuccessful check suite {check_suite.app.name} "
+                f"Unsuccessful check suite {check_suite.app_name} "
                 f"{check_suite.conclusion} for PR #{pr} of {org}/{repo}"
             )
             return False
     return success
 
 
-@task()
+@task(lane=True)
 @switchable("merge_bot")
 def merge_bot_status(org, repo, merge_bot_branch, sha):
-    with contextlib.suppress(github.BranchNotFoundError):
-        with github.temporary_clone(org, repo, merge_bot_branch) as clone_dir:
-            head_sha = github.git_get_head_sha(cwd=clone_dir)
-            if head_sha != sha:
-                # the branch has evolved, this means that this status
-                # does not correspond to the last commit of the bot, ignore it
-                return
-            pr, _, username, _ = parse_merge_bot_branch(merge_bot_branch)
-            with github.login() as gh:
-                gh_repo = gh.repository(org, repo)
-                gh_pr = gh.pull_request(org, repo, pr)
-                gh_commit = github.gh_call(gh_repo.commit, sha)
-                success = _get_commit_success(org, repo, pr, gh_commit)
-                if success is None:
-                    # checks in progress
-                    return
-                elif success:
+    pr, target_branch, username, _ = parse_merge_bot_branch(merge_bot_branch)
+    with github.login() as gh:
+        snapshot = load_pr_snapshot(gh, org, repo, pr, branch=merge_bot_branch, sha=sha)
+        if snapshot.branch_sha is None:
+            # the merge bot branch is gone
+            return
+        if snapshot.branch_sha != sha:
+            # the branch has evolved, this means that this status
+            # does not correspond to the last commit of the bot, ignore it
+            return
+        success = _get_commit_success(org, repo, pr, snapshot.checks)
+        if success is None:
+            # checks in progress
+            return
+        gh_pr = gh.pull_request(org, repo, pr)
+        if success:
+            with contextlib.suppress(github.BranchNotFoundError):
+                with github.temporary_clone(
+                    org,
+                    repo,
+                    merge_bot_branch,
+                    extra_refs=[f"refs/heads/{target_branch}", f"refs/pull/{pr}/head"],
+                ) as clone_dir:
+                    if github.git_get_head_sha(cwd=clone_dir) != sha:
+                        # the branch evolved since we checked its status
+                        return
                     try:
                         _merge_bot_merge_pr(org, repo, merge_bot_branch, clone_dir)
                     except CalledProcessError as e:
@@ -435,7 +450,7 @@ def merge_bot_status(org, repo, merge_bot_branch, sha):
                                 f"{e.output}\n```"
                             ),
                         )
-                        _remove_merging_label(github, gh_pr)
+                        _remove_merging_label(github, gh_pr, labels=snapshot.labels)
                         raise
                     except Exception as e:
                         github.gh_call(
@@ -445,20 +460,20 @@ def merge_bot_status(org, repo, merge_bot_branch, sha):
                                 f"finalized because an exception was raised: {e}."
                             ),
                         )
-                        _remove_merging_label(github, gh_pr)
+                        _remove_merging_label(github, gh_pr, labels=snapshot.labels)
                         raise
-                else:
-                    github.gh_call(
-                        gh_pr.create_comment,
-                        f"@{username} your merge command was aborted due to failed "
-                        f"check(s), which you can inspect on "
-                        f"[this commit of {merge_bot_branch}]"
-                        f"(https://github.com/{org}/{repo}/commits/{sha}).\n\n"
-                        f"After fixing the problem, you can re-issue a merge command. "
-                        f"Please refrain from merging manually as it will most "
-                        f"probably make the target branch red.",
-                    )
-                    check_call(
-                        ["git", "push", "origin", f":{merge_bot_branch}"], cwd=clone_dir
-                    )
-                    _remove_merging_label(github, gh_pr)
+        else:
+            github.gh_call(
+                gh_pr.create_comment,
+                f"@{username} your merge command was aborted due to failed "
+                f"check(s), which you can inspect on "
+                f"[this commit of {merge_bot_branch}]"
+                f"(https://github.com/{org}/{repo}/commits/{sha}).\n\n"
+                f"After fixing the problem, you can re-issue a merge command. "
+                f"Please refrain from merging manually as it will most "
+                f"probably make the target branch red.",
+            )
+            gh_repo = gh.repository(org, repo)
+            gh_ref = github.gh_call(gh_repo.ref, f"heads/{merge_bot_branch}")
+            github.gh_call(gh_ref.delete)
+            _remove_merging_label(github, gh_pr, labels=snapshot.labels)
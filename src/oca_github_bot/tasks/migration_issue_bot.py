@@ -6,7 +6,7 @@ import re
 
 from .. import github
 from ..config import switchable
-from ..manifest import user_can_push
+from ..manifest import ADDONS_SPARSE_CHECKOUT, user_can_push
 from ..process import check_call
 from ..queue import task
 from ..utils import hide_secrets
@@ -100,14 +100,19 @@ def migration_issue_start(org, repo, pr, username, module=None, dry_run=False):
         target_branch = gh_pr.base.ref
         pr_branch = f"tmp-pr-{pr}"
         try:
-            with github.temporary_clone(org, repo, target_branch) as clone_dir:
+            with github.temporary_clone(
+                org,
+                repo,
+                target_branch,
+                extra_refs=[f"refs/pull/{pr}/head"],
+                sparse=ADDONS_SPARSE_CHECKOUT,
+            ) as clone_dir:
                 # Create merge bot branch from PR and rebase it on target branch
                 # This only serves for checking permissions
                 check_call(
-                    ["git", "fetch", "origin", f"pull/{pr}/head:{pr_branch}"],
+                    ["git", "checkout", "-B", pr_branch, f"origin/pull/{pr}/head"],
                     cwd=clone_dir,
                 )
-                check_call(["git", "checkout", pr_branch], cwd=clone_dir)
                 if not user_can_push(gh, org, repo, username, clone_dir, target_branch):
                     github.gh_call(
                         gh_pr.create_comment,
@@ -11,7 +11,7 @@ from ..utils import cmd_to_str, hide_secrets
 _logger = getLogger(__name__)
 
 
-@task()
+@task(lane=True)
 @switchable("rebase_bot")
 def rebase_bot_start(org, repo, pr, username, dry_run=False):
     with github.login() as gh:
@@ -20,7 +20,9 @@ def rebase_bot_start(org, repo, pr, username, dry_run=False):
         remote = gh_pr.head._repo_owner
         pr_branch = f"tmp-pr-{pr}"
         try:
-            with github.temporary_clone(org, repo, target_branch) as clone_dir:
+            with github.temporary_clone(
+                org, repo, target_branch, extra_refs=[f"refs/pull/{pr}/head"]
+            ) as clone_dir:
                 if not remote:
                     github.gh_call(
                         gh_pr.create_comment,
@@ -29,10 +31,9 @@ def rebase_bot_start(org, repo, pr, username, dry_run=False):
                     )
                     return
                 check_call(
-                    ["git", "fetch", "origin", f"pull/{pr}/head:{pr_branch}"],
+                    ["git", "checkout", "-B", pr_branch, f"origin/pull/{pr}/head"],
                     cwd=clone_dir,
                 )
-                check_call(["git", "checkout", pr_branch], cwd=clone_dir)
                 if not user_can_push(gh, org, repo, username, clone_dir, target_branch):
                     github.gh_call(
                         gh_pr.create_comment,
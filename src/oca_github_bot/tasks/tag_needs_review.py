@@ -1,7 +1,9 @@
 # Distributed under the MIT License (http://opensource.org/licenses/MIT).
 
+from .. import github
 from ..config import switchable
-from ..github import gh_call, repository
+from ..github import gh_call
+from ..pr_snapshot import load_pr_snapshot
 from ..queue import getLogger, task
 
 _logger = getLogger(__name__)
@@ -18,15 +20,19 @@ def tag_needs_review(org, pr, repo, status, dry_run=False):
     begining of the title (case insensitive). Removes the tag if the CI
     fails.
     """
-    with repository(org, repo) as gh_repo:
-        gh_pr = gh_call(gh_repo.pull_request, pr)
-        gh_issue = gh_call(gh_pr.issue)
-        labels = [label.name for label in gh_issue.labels()]
+    with github.login() as gh:
+        snapshot = load_pr_snapshot(gh, org, repo, pr)
         has_wip = (
-            gh_pr.title.lower().startswith(("wip:", "[wip]")) or LABEL_WIP in labels
+            snapshot.title.lower().startswith(("wip:", "[wip]"))
+            or LABEL_WIP in snapshot.labels
         )
-        if status == "success" and not has_wip:
+        if (
+            status == "success"
+            and not has_wip
+            and LABEL_NEEDS_REVIEW not in snapshot.labels
+        ):
             if dry_run:
                 _logger.info(f"DRY-RUN add {LABEL_NEEDS_REVIEW} label")
             else:
+                gh_issue = gh_call(gh.issue, org, repo, pr)
                 gh_call(gh_issue.add_labels, LABEL_NEEDS_REVIEW)
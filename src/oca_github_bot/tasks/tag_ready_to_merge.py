@@ -1,16 +1,19 @@
 # Copyright (c) ACSONE SA/NV 2018
 # Distributed under the MIT License (http://opensource.org/licenses/MIT).
 
+import json
 from datetime import datetime, timedelta
 
-from .. import github
+from .. import cache, github
 from ..config import MIN_PR_AGE, switchable
 from ..github import gh_call, gh_datetime
+from ..pr_snapshot import load_pr_snapshot
 from ..queue import getLogger, task
 
 _logger = getLogger(__name__)
 
 
+LABEL_APPROVED = "approved"
 LABEL_READY_TO_MERGE = "ready to merge"
 READY_TO_MERGE_COMMENT = (
     "This PR has the `approved` label and "
@@ -20,34 +23,226 @@ READY_TO_MERGE_COMMENT = (
     "no declared maintainer). 🤖"
 )
 
+# The sweep keeps a cursor in the cache, so it searches only PRs that became
+# old enough, or that changed, since the previous sweep. PRs that changed in
+# the overlap before the previous sweep are searched again, since their
+# status may have been completed after it. A status completing does not
+# change a PR, so PRs whose status turns green are evaluated when the status
+# and check suite webhooks are received (see sha), and a full sweep is done
+# once in FULL_SWEEP_INTERVAL, in case a webhook was missed.
+SWEEP_OVERLAP = timedelta(hours=6)
+FULL_SWEEP_INTERVAL = timedelta(days=1)
+CURSOR_TTL = 7 * 24 * 3600
+# seconds a labelled PR is remembered, as the search index may lag behind
+EVALUATED_TTL = 24 * 3600
+# number of PRs labelled and commented per GraphQL mutation
+WRITE_BATCH_SIZE = 20
+
+_SEARCH_QUERY = """
+query searchPrs($searchQuery: String!, $label: String!, $after: String) {
+  search(query: $searchQuery, type: ISSUE, first: 100, after: $after) {
+    pageInfo { hasNextPage endCursor }
+    nodes {
+      ... on PullRequest {
+        id
+        url
+        number
+        repository { name label(name: $label) { id } }
+      }
+    }
+  }
+}
+"""
+
+
+def _is_ready_to_merge(snapshot, max_created):
+    """Tell if a PR meets the conditions of the org-wide search."""
+    return (
+        snapshot.state == "open"
+        and LABEL_APPROVED in snapshot.labels
+        and LABEL_READY_TO_MERGE not in snapshot.labels
+        and snapshot.checks is not None
+        and snapshot.checks.state == "success"
+        and snapshot.created_at < max_created
+    )
+
+
+def _tag_pr(gh, org, repo, pr, max_created, dry_run):
+    snapshot = load_pr_snapshot(gh, org, repo, pr)
+    if _is_ready_to_merge(snapshot, max_created):
+        gh_issue = gh_call(gh.issue, org, repo, pr)
+        _add_ready_to_merge_label(gh_issue, snapshot.url, dry_run)
+
+
+def _add_ready_to_merge_label(gh_issue, html_url, dry_run):
+    if dry_run:
+        _logger.info(f"DRY-RUN add {LABEL_READY_TO_MERGE} label to PR {html_url}")
+    else:
+        _logger.info(f"add {LABEL_READY_TO_MERGE} label to PR {html_url}")
+        gh_call(gh_issue.add_labels, LABEL_READY_TO_MERGE)
+        gh_call(gh_issue.create_comment, READY_TO_MERGE_COMMENT)
+
+
+def _search_prs(gh, query):
+    """Search PRs with GraphQL, with their id and ready to merge label id."""
+    after = None
+    while True:
+        result = github.graphql(
+            gh,
+            _SEARCH_QUERY,
+            searchQuery=query,
+            label=LABEL_READY_TO_MERGE,
+            after=after,
+        )["search"]
+        yield from (node for node in result["nodes"] if node)
+        if not result["pageInfo"]["hasNextPage"]:
+            return
+        after = result["pageInfo"]["endCursor"]
+
+
+def _add_ready_to_merge_labels(gh, org, prs, dry_run):
+    """Label and comment PRs found by _search_prs, in batched mutations."""
+    for pr in prs:
+        _logger.info(
+            f"{'DRY-RUN ' if dry_run else ''}"
+            f"add {LABEL_READY_TO_MERGE} label to PR {pr['url']}"
+        )
+    if dry_run:
+        return
+    batch = []
+    for pr in prs:
+        if not pr["repository"]["label"]:
+            # the REST API creates the label if the repository doesn't have it
+            gh_issue = gh_call(gh.issue, org, pr["repository"]["name"], pr["number"])
+            _add_ready_to_merge_label(gh_issue, pr["url"], dry_run)
+            continue
+        batch.append(pr)
+    for i in range(0, len(batch), WRITE_BATCH_SIZE):
+        variables = {"body": READY_TO_MERGE_COMMENT}
+        declarations = ["$body: String!"]
+        mutations = []
+        for j, pr in enumerate(batch[i : i + WRITE_BATCH_SIZE]):
+            variables[f"pr{j}"] = pr["id"]
+            variables[f"label{j}"] = pr["repository"]["label"]["id"]
+            declarations += [f"$pr{j}: ID!", f"$label{j}: ID!"]
+            mutations += [
+                f"label{j}: addLabelsToLabelable("
+                f"input: {{labelableId: $pr{j}, labelIds: [$label{j}]}}"
+                f") {{ clientMutationId }}",
+                f"comment{j}: addComment("
+                f"input: {{subjectId: $pr{j}, body: $body}}"
+                f") {{ clientMutationId }}",
+            ]
+        mutation = (
+            f"mutation tagReadyToMerge({', '.join(declarations)}) {{\n"
+            + "\n".join(mutations)
+            + "\n}"
+        )
+        github.graphql(gh, mutation, **variables)
+
+
+def _sweep_queries(scope, cursor, max_created, now):
+    """Return the search queries of a sweep, given the previous cursor."""
+    query = [
+        "type:pr",
+        "state:open",
+        "status:success",
+        f"label:{LABEL_APPROVED}",
+        f'-label:"{LABEL_READY_TO_MERGE}"',
+        scope,
+    ]
+    if cursor is None or now - cursor["full_at"] > FULL_SWEEP_INTERVAL:
+        return [query + [f"created:<{gh_datetime(max_created)}"]]
+    since = cursor["run_at"] - SWEEP_OVERLAP
+    return [
+        # PRs that became old enough since the previous sweep
+        query
+        + [f"created:{gh_datetime(cursor['boundary'])}..{gh_datetime(max_created)}"],
+        # older PRs that changed since the previous sweep
+        query
+        + [
+            f"created:<{gh_datetime(cursor['boundary'])}",
+            f"updated:>={gh_datetime(since)}",
+        ],
+    ]
+
+
+def _load_cursor(key):
+    cursor = cache.get(key)
+    if cursor is None:
+        return None
+    return {
+        name: datetime.fromisoformat(value)
+        for name, value in json.loads(cursor).items()
+    }
+
+
+def _save_cursor(key, cursor):
+    value = {name: dt.isoformat() for name, dt in cursor.items()}
+    cache.set(key, json.dumps(value), CURSOR_TTL)
+
 
 @task()
 @switchable()
-def tag_ready_to_merge(org, repo=None, dry_run=False):
-    """Add the ``ready to merge`` tag to all PRs where conditions are met."""
+def tag_ready_to_merge(org, repo=None, pr=None, dry_run=False, sha=None):
+    """Add the ``ready to merge`` tag to all PRs where conditions are met.
+
+    When pr is given, only that PR of repo is evaluated, without searching.
+    When sha is given, the approved PRs of repo whose head is sha are
+    evaluated, after their status changed. Otherwise PRs are searched
+    incrementally, from a cursor kept in the cache (see SWEEP_OVERLAP).
+
+    The hourly sweep is queued as low priority by the cron schedule, while
+    the evaluation of a PR that has just been approved runs right away.
+    """
     with github.login() as gh:
-        max_created = datetime.utcnow() - timedelta(days=MIN_PR_AGE)
-        query = [
-            "type:pr",
-            "state:open",
-            "status:success",
-            "label:approved",
-            '-label:"ready to merge"',
-            f"created:<{gh_datetime(max_created)}",
-        ]
-        if repo:
-            query.append(f"repo:{org}/{repo}")
-        else:
-            query.append(f"org:{org}")
-        for issue in gh.search_issues(" ".join(query)):
-            if dry_run:
-                _logger.info(
-                    f"DRY-RUN add {LABEL_READY_TO_MERGE} "
-                    f"label to PR {issue.html_url}"
-                )
-            else:
-                _logger.info(f"add {LABEL_READY_TO_MERGE} label to PR {issue.html_url}")
-                gh_issue = issue.issue
-                gh_call(gh_issue.add_labels, LABEL_READY_TO_MERGE)
-                gh_pr = gh_issue.pull_request()
-                gh_call(gh_pr.create_comment, READY_TO_MERGE_COMMENT)
+        now = datetime.utcnow()
+        max_created = now - timedelta(days=MIN_PR_AGE)
+        if pr:
+            _tag_pr(gh, org, repo, pr, max_created, dry_run)
+            return
+        if sha:
+            # the search index may not know the status yet, so the status
+            # of the PRs found is read from their snapshot
+            query = [
+                "type:pr",
+                "state:open",
+                f"label:{LABEL_APPROVED}",
+                f'-label:"{LABEL_READY_TO_MERGE}"',
+                f"repo:{org}/{repo}",
+                sha,
+            ]
+            for found_pr in _search_prs(gh, " ".join(query)):
+                _tag_pr(gh, org, repo, found_pr["number"], max_created, dry_run)
+            return
+        scope = f"repo:{org}/{repo}" if repo else f"org:{org}"
+        cursor_key = f"ready-to-merge-cursor:{scope}"
+        cursor = _load_cursor(cursor_key)
+        queries = _sweep_queries(scope, cursor, max_created, now)
+        prs = {}
+        for query in queries:
+            for found_pr in _search_prs(gh, " ".join(query)):
+                prs[found_pr["id"]] = found_pr
+        if dry_run:
+            _add_ready_to_merge_labels(gh, org, list(prs.values()), dry_run)
+            return
+        # skip PRs labelled by a previous sweep, still in the search index
+        evaluated_keys = [f"ready-to-merge:{pr_id}" for pr_id in prs]
+        is_new = cache.add_many(evaluated_keys, EVALUATED_TTL)
+        try:
+            _add_ready_to_merge_labels(
+                gh,
+                org,
+                [found for found, new in zip(prs.values(), is_new, strict=True) if new],
+                dry_run,
+            )
+        except Exception:
+            # evaluate them again next time
+            for key, new in zip(evaluated_keys, is_new, strict=True):
+                if new:
+                    cache.delete(key)
+            raise
+        full_at = cursor["full_at"] if len(queries) > 1 else now
+        _save_cursor(
+            cursor_key, {"boundary": max_created, "run_at": now, "full_at": full_at}
+        )
@@ -3,6 +3,7 @@
 
 from . import (
     on_command,
+    on_membership_invalidate_permissions,
     on_pr_close_delete_branch,
     on_pr_green_label_needs_review,
     on_pr_label_modified_addons,
@@ -11,4 +12,5 @@ from . import (
     on_pr_review,
     on_push_to_main_branch,
     on_status_merge_bot,
+    on_status_tag_ready_to_merge,
 )
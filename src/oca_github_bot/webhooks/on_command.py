@@ -3,6 +3,7 @@
 
 from ..commands import CommandError, parse_commands
 from ..config import OCABOT_EXTRA_DOCUMENTATION, OCABOT_USAGE
+from ..queue import enqueue
 from ..router import router
 from ..tasks.add_pr_comment import add_pr_comment
 
@@ -23,11 +24,12 @@ async def on_command(event, gh, *args, **kwargs):
 async def _on_command(org, repo, pr, username, text):
     try:
         for command in parse_commands(text):
-            command.delay(org, repo, pr, username)
+            await enqueue(command, org, repo, pr, username)
     except CommandError as e:
         # Add a comment on the current PR, if
         # the command was misunderstood by the bot
-        add_pr_comment.delay(
+        await enqueue(
+            add_pr_comment,
             org,
             repo,
             pr,
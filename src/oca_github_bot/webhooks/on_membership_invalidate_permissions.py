@@ -0,0 +1,31 @@
+# Copyright (c) ACSONE SA/NV 2026
+# Distributed under the MIT License (http://opensource.org/licenses/MIT).
+
+import asyncio
+import logging
+
+from ..github import invalidate_user_permissions
+from ..router import router
+
+_logger = logging.getLogger(__name__)
+
+
+@router.register("member")
+@router.register("membership")
+@router.register("team")
+@router.register("organization")
+async def on_membership_invalidate_permissions(event, gh, *args, **kwargs):
+    """
+    When collaborators, teams or organization members change,
+    forget the cached permissions of users on the organization repositories.
+    """
+    if "organization" in event.data:
+        org = event.data["organization"]["login"]
+    elif "repository" in event.data:
+        org = event.data["repository"]["owner"]["login"]
+    else:
+        return
+    _logger.info("invalidating cached permissions in %s", org)
+    # the cache is not called from the event loop
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, invalidate_user_permissions, org)
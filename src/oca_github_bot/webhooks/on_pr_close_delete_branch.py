@@ -3,6 +3,7 @@
 
 import logging
 
+from ..queue import enqueue
 from ..router import router
 from ..tasks.delete_branch import delete_branch
 from ..version_branch import is_protected_branch
@@ -24,4 +25,4 @@ async def on_pr_close_delete_branch(event, gh, *args, **kwargs):
     org, repo = event.data["repository"]["full_name"].split("/")
 
     if not forked and merged and not is_protected_branch(branch):
-        delete_branch.delay(org, repo, branch)
+        await enqueue(delete_branch, org, repo, branch)
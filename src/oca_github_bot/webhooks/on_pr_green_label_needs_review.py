@@ -1,5 +1,6 @@
 # Distributed under the MIT License (http://opensource.org/licenses/MIT).
 
+from ..queue import enqueue
 from ..router import router
 from ..tasks.tag_needs_review import tag_needs_review
 
@@ -12,4 +13,4 @@ async def on_pr_green_label_needs_review(event, gh, *args, **kwargs):
     status = event.data["check_suite"]["conclusion"]
     org, repo = event.data["repository"]["full_name"].split("/")
     for pr in event.data["check_suite"]["pull_requests"]:
-        tag_needs_review.delay(org, pr["number"], repo, status)
+        await enqueue(tag_needs_review, org, pr["number"], repo, status)
@@ -3,6 +3,7 @@
 
 import logging
 
+from ..queue import enqueue
 from ..router import router
 from ..tasks.label_modified_addons import label_modified_addons
 
@@ -18,4 +19,4 @@ async def on_pr_label_modified_addons(event, *args, **kwargs):
     """
     org, repo = event.data["repository"]["full_name"].split("/")
     pr = event.data["pull_request"]["number"]
-    label_modified_addons.delay(org, repo, pr)
+    await enqueue(label_modified_addons, org, repo, pr)
@@ -3,6 +3,7 @@
 
 import logging
 
+from ..queue import enqueue
 from ..router import router
 from ..tasks.mention_maintainer import mention_maintainer
 
@@ -17,4 +18,4 @@ async def on_pr_open_mention_maintainer(event, *args, **kwargs):
     """
     org, repo = event.data["repository"]["full_name"].split("/")
     pr = event.data["pull_request"]["number"]
-    mention_maintainer.delay(org, repo, pr)
+    await enqueue(mention_maintainer, org, repo, pr)
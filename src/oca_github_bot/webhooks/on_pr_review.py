@@ -1,6 +1,7 @@
 # Copyright (c) ACSONE SA/NV 2018
 # Distributed under the MIT License (http://opensource.org/licenses/MIT).
 
+from ..queue import enqueue
 from ..router import router
 from ..tasks.tag_approved import tag_approved
 from .on_command import _on_command
@@ -13,5 +14,5 @@ async def on_pr_review(event, gh, *args, **kwargs):
     pr = event.data["pull_request"]["number"]
     username = event.data["review"]["user"]["login"]
     text = event.data["review"]["body"]
-    tag_approved.delay(org, repo, pr)
+    await enqueue(tag_approved, org, repo, pr)
     await _on_command(org, repo, pr, username, text)
@@ -3,6 +3,7 @@
 
 import logging
 
+from ..queue import enqueue
 from ..router import router
 from ..tasks.main_branch_bot import main_branch_bot
 from ..version_branch import is_main_branch_bot_branch
@@ -21,4 +22,4 @@ async def on_push_to_main_branch(event, gh, *args, **kwargs):
     if not is_main_branch_bot_branch(branch):
         return
 
-    main_branch_bot.delay(org, repo, branch, build_wheels=False)
+    await enqueue(main_branch_bot, org, repo, branch, build_wheels=False)
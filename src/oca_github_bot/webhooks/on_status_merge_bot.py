@@ -3,6 +3,7 @@
 # Distributed under the MIT License (http://opensource.org/licenses/MIT).
 
 from ..config import GITHUB_CHECK_SUITES_IGNORED, GITHUB_STATUS_IGNORED
+from ..queue import enqueue
 from ..router import router
 from ..tasks.merge_bot import merge_bot_status
 from ..version_branch import is_merge_bot_branch, search_merge_bot_branch
@@ -23,7 +24,7 @@ async def on_check_suite_merge_bot(event, gh, *args, **kwargs):
     if not is_merge_bot_branch(branch_name):
         return
 
-    merge_bot_status.delay(org, repo, branch_name, sha)
+    await enqueue(merge_bot_status, org, repo, branch_name, sha)
 
 
 @router.register("check_run")
@@ -57,7 +58,7 @@ async def on_check_run_merge_bot(event, gh, *args, **kwargs):
         # this check_run is not for a merge bot branch
         return
 
-    merge_bot_status.delay(org, repo, branch_name, sha)
+    await enqueue(merge_bot_status, org, repo, branch_name, sha)
 
 
 @router.register("status")
@@ -79,4 +80,4 @@ async def on_status_merge_bot(event, gh, *args, **kwargs):
     else:
         return
 
-    merge_bot_status.delay(org, repo, branch_name, sha)
+    await enqueue(merge_bot_status, org, repo, branch_name, sha)
@@ -0,0 +1,37 @@
+# Copyright (c) ACSONE SA/NV 2026
+# Distributed under the MIT License (http://opensource.org/licenses/MIT).
+
+from ..config import GITHUB_CHECK_SUITES_IGNORED, GITHUB_STATUS_IGNORED
+from ..queue import enqueue
+from ..router import router
+from ..tasks.tag_ready_to_merge import tag_ready_to_merge
+from ..version_branch import is_merge_bot_branch
+
+
+@router.register("check_suite", action="completed")
+async def on_check_suite_tag_ready_to_merge(event, gh, *args, **kwargs):
+    """Tag approved pull requests ready to merge when their checks succeed.
+
+    The hourly sweep only finds pull requests that changed recently, and
+    the completion of their checks does not change them.
+    """
+    org, repo = event.data["repository"]["full_name"].split("/")
+    check_suite = event.data["check_suite"]
+    if check_suite["conclusion"] != "success":
+        return
+    if check_suite["app"]["name"] in GITHUB_CHECK_SUITES_IGNORED:
+        return
+    if is_merge_bot_branch(check_suite["head_branch"]):
+        return
+    await enqueue(tag_ready_to_merge, org, repo, sha=check_suite["head_sha"])
+
+
+@router.register("status")
+async def on_status_tag_ready_to_merge(event, gh, *args, **kwargs):
+    """Tag approved pull requests ready to merge when their status succeeds."""
+    org, repo = event.data["repository"]["full_name"].split("/")
+    if event.data["state"] != "success":
+        return
+    if event.data["context"] in GITHUB_STATUS_IGNORED:
+        return
+    await enqueue(tag_ready_to_merge, org, repo, sha=event.data["sha"])
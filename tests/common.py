@@ -42,3 +42,75 @@ def set_config(**kwargs):
     finally:
         for key in saved:
             setattr(config, key, kwargs[key])
+
+
+def graphql_page(nodes, cursor=None, backward=False):
+    """A page of a GraphQL connection, followed (or preceded) by another
+    one if cursor is given."""
+    return {
+        "pageInfo": {
+            "hasNextPage": bool(cursor) and not backward,
+            "endCursor": cursor,
+            "hasPreviousPage": bool(cursor) and backward,
+            "startCursor": cursor,
+        },
+        "nodes": nodes,
+    }
+
+
+def graphql_commit(sha, states, suites, cursor=None):
+    return {
+        "oid": sha,
+        "statusCheckRollup": {"state": "SUCCESS"},
+        "status": {
+            "contexts": [
+                {"context": context, "state": state} for context, state in states
+            ]
+        },
+        "checkSuites": graphql_page(
+            [
+                {
+                    "app": {"name": name},
+                    "conclusion": conclusion,
+                    "checkRuns": {"totalCount": count},
+                }
+                for name, conclusion, count in suites
+            ],
+            cursor,
+        ),
+    }
+
+
+def graphql_reviews(reviews):
+    return [{"state": state, "author": {"login": login}} for login, state in reviews]
+
+
+def graphql_repository(
+    reviews, labels=(), mergeable="MERGEABLE", reviews_cursor=None, **extra
+):
+    return {
+        "repository": {
+            "pullRequest": {
+                "url": "https://github.com/OCA/some-repo/pull/42",
+                "title": "[16.0][ADD] some_addon",
+                "state": "OPEN",
+                "createdAt": "2024-01-02T03:04:05Z",
+                "mergeable": mergeable,
+                "headRefOid": "1" * 40,
+                "labels": graphql_page([{"name": label} for label in labels]),
+                "reviews": graphql_page(
+                    graphql_reviews(reviews), reviews_cursor, backward=True
+                ),
+                "commits": {
+                    "nodes": [
+                        {
+                            "commit": graphql_commit(
+                                "1" * 40, [("ci/runbot", "SUCCESS")], []
+                            )
+                        }
+                    ]
+                },
+            },
+            **extra,
+        }
+    }
@@ -6,7 +6,56 @@ import subprocess
 import github3
 import pytest
 
-from oca_github_bot import config
+from oca_github_bot import cache, config
+from oca_github_bot.manifest import AddonIndex, MaintainersMap
+
+
+@pytest.fixture(autouse=True)
+def addon_index_dir(tmp_path, monkeypatch):
+    """Keep addon indexes and maintainers maps of tests apart from each
+    other, and out of the user cache directory."""
+    index_dir = tmp_path / "addon-index"
+    monkeypatch.setattr(
+        AddonIndex, "default_index_dir", staticmethod(lambda: str(index_dir))
+    )
+    monkeypatch.setattr(MaintainersMap, "_maps", {})
+    return index_dir
+
+
+@pytest.fixture(autouse=True)
+def no_cache(monkeypatch):
+    """Keep tests away from the Redis instance of CACHE_URI, if reachable."""
+    monkeypatch.setattr(config, "CACHE_URI", "")
+    monkeypatch.setattr(cache, "_client", None)
+
+
+@pytest.fixture
+def fake_cache(monkeypatch):
+    """Replace the shared cache with a dictionary, which is returned."""
+    store = {}
+
+    def set_(key, value, ttl):
+        store[key] = str(value)
+
+    def incr(key):
+        store[key] = str(int(store.get(key, 0)) + 1)
+
+    def add_many(keys, ttl):
+        added = []
+        for key in keys:
+            added.append(key not in store)
+            store.setdefault(key, "1")
+        return added
+
+    monkeypatch.setattr(cache, "get", store.get)
+    monkeypatch.setattr(cache, "set", set_)
+    monkeypatch.setattr(cache, "incr", incr)
+    monkeypatch.setattr(cache, "delete", lambda key: store.pop(key, None))
+    monkeypatch.setattr(
+        cache, "delete_many", lambda keys: [store.pop(key, None) for key in keys]
+    )
+    monkeypatch.setattr(cache, "add_many", add_many)
+    return store
 
 
 @pytest.fixture
@@ -0,0 +1,192 @@
+# Copyright (c) ACSONE SA/NV 2026
+# Distributed under the MIT License (http://opensource.org/licenses/MIT).
+
+import os
+import subprocess
+import threading
+import time
+from pathlib import Path
+
+from oca_github_bot.git_cache import (
+    _FETCH_LOCK,
+    _write_fetch_stamps,
+    evict_checkouts,
+    fetch,
+    flock,
+    leased_checkout,
+    ref_index,
+)
+from oca_github_bot.github import git_get_current_branch, git_get_head_sha
+from oca_github_bot.manifest import ADDONS_SPARSE_CHECKOUT, is_addon_dir
+
+from .common import commit_addon, make_addon
+
+
+def _lease(tmp_path, git_clone, pool_size=10):
+    remote = str(tmp_path / "remote")
+    return leased_checkout(
+        str(tmp_path / "pool"), "remote/master", remote, remote, "master", pool_size
+    )
+
+
+def test_leased_checkout_reuse(tmp_path, git_clone):
+    with _lease(tmp_path, git_clone) as checkout_dir:
+        assert git_get_head_sha(checkout_dir) == git_get_head_sha(git_clone)
+        # leave the checkout in a dirty state
+        subprocess.check_call(["git", "checkout", "-b", "abranch"], cwd=checkout_dir)
+        subprocess.check_call(
+            ["git", "remote", "add", "fork", "/tmp"], cwd=checkout_dir
+        )
+        (Path(checkout_dir) / "somefile").write_text("dirty")
+        (Path(checkout_dir) / "newfile").write_text("new")
+    # a new commit is pushed in the meantime
+    (git_clone / "somefile").write_text("changed")
+    subprocess.check_call(["git", "commit", "-am", "[BOT] change"], cwd=git_clone)
+    subprocess.check_call(["git", "push", "origin", "master"], cwd=git_clone)
+    with _lease(tmp_path, git_clone) as checkout_dir2:
+        assert checkout_dir2 == checkout_dir
+        assert git_get_current_branch(checkout_dir) == "master"
+        assert git_get_head_sha(checkout_dir) == git_get_head_sha(git_clone)
+        assert (Path(checkout_dir) / "somefile").read_text() == "changed"
+        assert not os.path.exists(os.path.join(checkout_dir, "newfile"))
+        branches = subprocess.check_output(
+            ["git", "branch", "--format=%(refname:short)"], cwd=checkout_dir, text=True
+        )
+        assert branches.split() == ["master"]
+        remotes = subprocess.check_output(
+            ["git", "remote"], cwd=checkout_dir, text=True
+        )
+        assert remotes.split() == ["origin"]
+
+
+def test_leased_checkout_push_credentials(tmp_path, git_clone):
+    with _lease(tmp_path, git_clone) as checkout_dir:
+        # like rebase_bot pushing to a fork
+        subprocess.check_call(
+            ["git", "remote", "add", "fork", "https://github.com/fork/repo"],
+            cwd=checkout_dir,
+        )
+        for remote in ("origin", "fork"):
+            subprocess.check_call(
+                ["git", "remote", "set-url", "--push", remote, "https://s3cr3t@x"],
+                cwd=checkout_dir,
+            )
+    config_text = (Path(checkout_dir) / ".git" / "config").read_text()
+    assert "s3cr3t" not in config_text
+    assert "fork" not in config_text
+
+
+def test_leased_checkout_concurrent(tmp_path, git_clone):
+    with _lease(tmp_path, git_clone) as checkout_dir1:
+        with _lease(tmp_path, git_clone) as checkout_dir2:
+            assert checkout_dir1 != checkout_dir2
+    with _lease(tmp_path, git_clone) as checkout_dir3:
+        assert checkout_dir3 == checkout_dir1
+
+
+def test_evict_checkouts(tmp_path, git_clone):
+    pool_dir = tmp_path / "pool"
+    with _lease(tmp_path, git_clone, pool_size=1) as checkout_dir1:
+        with _lease(tmp_path, git_clone, pool_size=1) as checkout_dir2:
+            pass
+        # checkout_dir1 is leased so checkout_dir2 was evicted
+        assert os.path.isdir(checkout_dir1)
+        assert not os.path.exists(checkout_dir2)
+    assert os.path.isdir(checkout_dir1)
+    evict_checkouts(str(pool_dir), 0)
+    assert not os.listdir(pool_dir)
+
+
+def test_fetch_freshness(tmp_path, git_clone):
+    remote = str(tmp_path / "remote")
+    cache = str(tmp_path / "cache")
+    refs = ["refs/heads/*"]
+    assert fetch(cache, remote, refs)
+    assert git_get_head_sha(cache) == git_get_head_sha(git_clone)
+    assert not fetch(cache, remote, refs, freshness=3600)
+    assert fetch(cache, remote, refs, freshness=0)
+
+
+def test_fetch_piggy_back(tmp_path, git_clone):
+    remote = str(tmp_path / "remote")
+    cache = str(tmp_path / "cache")
+    refs = ["refs/heads/*"]
+    assert fetch(cache, remote, refs)
+    results = []
+    with flock(os.path.join(cache, _FETCH_LOCK)):
+        thread = threading.Thread(
+            target=lambda: results.append(fetch(cache, remote, refs))
+        )
+        thread.start()
+        time.sleep(0.1)
+        # another fetch starts while the thread waits for the lock
+        _write_fetch_stamps(cache, {refs[0]: time.time()})
+    thread.join()
+    assert results == [False]
+
+
+def test_fetch_targeted(tmp_path, git_clone):
+    remote = str(tmp_path / "remote")
+    cache = str(tmp_path / "cache")
+    subprocess.check_call(["git", "checkout", "-b", "other"], cwd=git_clone)
+    subprocess.check_call(["git", "push", "origin", "other"], cwd=git_clone)
+    subprocess.check_call(
+        ["git", "push", "origin", "HEAD:refs/pull/1/head"], cwd=git_clone
+    )
+    refs = ["refs/heads/master", "refs/pull/1/head"]
+    assert fetch(cache, remote, refs)
+    cache_refs = subprocess.check_output(
+        ["git", "for-each-ref", "--format=%(refname)"], cwd=cache, text=True
+    ).split()
+    assert sorted(cache_refs) == sorted(refs)
+    # a fetch of all branches covers the master branch, but not pull requests
+    assert fetch(cache, remote, ["refs/heads/*"])
+    assert not fetch(cache, remote, ["refs/heads/master"], freshness=3600)
+    with leased_checkout(
+        str(tmp_path / "pool"), "key", cache, remote, "master", 10, refs=refs
+    ) as checkout_dir:
+        checkout_refs = subprocess.check_output(
+            ["git", "for-each-ref", "--format=%(refname)"], cwd=checkout_dir, text=True
+        ).split()
+        assert sorted(checkout_refs) == [
+            "refs/heads/master",
+            "refs/remotes/origin/master",
+            "refs/remotes/origin/pull/1/head",
+        ]
+
+
+def test_ref_index(tmp_path, git_clone):
+    remote = str(tmp_path / "remote")
+    cache = str(tmp_path / "cache")
+    fetch(cache, remote, ["refs/heads/*"])
+    index = ref_index(cache)
+    assert index == {"refs/heads/master": git_get_head_sha(git_clone)}
+    assert ref_index(cache) is index
+    subprocess.check_call(["git", "push", "origin", "master:other"], cwd=git_clone)
+    fetch(cache, remote, ["refs/heads/*"])
+    assert "refs/heads/other" in ref_index(cache)
+
+
+def test_leased_checkout_sparse(tmp_path, git_clone):
+    remote = str(tmp_path / "remote")
+    make_addon(git_clone, "addon1")
+    (git_clone / "addon1" / "data.xml").write_text("<odoo/>")
+    commit_addon(git_clone, "addon1")
+    subprocess.check_call(["git", "push", "origin", "master"], cwd=git_clone)
+    with leased_checkout(
+        str(tmp_path / "pool"),
+        "key",
+        remote,
+        remote,
+        "master",
+        10,
+        sparse=ADDONS_SPARSE_CHECKOUT,
+    ) as checkout_dir:
+        checkout_dir = Path(checkout_dir)
+        assert (checkout_dir / "somefile").exists()
+        assert is_addon_dir(checkout_dir / "addon1")
+        assert not (checkout_dir / "addon1" / "__init__.py").exists()
+        assert not (checkout_dir / "addon1" / "data.xml").exists()
+    with _lease(tmp_path, git_clone) as full_checkout_dir:
+        assert full_checkout_dir != str(checkout_dir)
+        assert (Path(full_checkout_dir) / "addon1" / "data.xml").exists()
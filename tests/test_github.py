@@ -0,0 +1,229 @@
+# Copyright (c) ACSONE SA/NV 2026
+# Distributed under the MIT License (http://opensource.org/licenses/MIT).
+
+import subprocess
+import time
+from pathlib import Path
+
+import github3
+import pytest
+import requests
+from celery.exceptions import Retry
+
+from oca_github_bot import config, github, http_cache
+from oca_github_bot.tasks.delete_branch import delete_branch
+
+
+@pytest.fixture
+def sessions(mocker):
+    mocker.patch.object(github, "_sessions", [])
+    return mocker.patch(
+        "oca_github_bot.github.github3.login",
+        side_effect=lambda token: mocker.MagicMock(),
+    )
+
+
+def test_login_pool(sessions):
+    with github.login() as gh1:
+        with github.login() as gh2:
+            assert gh1 is not gh2
+    with github.login() as gh3:
+        assert gh3 in (gh1, gh2)
+    assert sessions.call_count == 2
+
+
+def test_login_pool_size(sessions, mocker):
+    mocker.patch.object(config, "GITHUB_SESSION_POOL_SIZE", 1)
+    with github.login() as gh1:
+        with github.login() as gh2:
+            pass
+    # gh2 was released first and fills the pool
+    gh2.session.close.assert_not_called()
+    gh1.session.close.assert_called_once()
+
+
+def test_login_pool_health(sessions, mocker):
+    with pytest.raises(requests.exceptions.ConnectionError):
+        with github.login() as gh1:
+            raise requests.exceptions.ConnectionError()
+    gh1.session.close.assert_called_once()
+    with github.login() as gh2:
+        assert gh2 is not gh1
+    # idle sessions are not reused
+    mocker.patch("oca_github_bot.github.time.time", return_value=time.time() + 3600)
+    with github.login() as gh3:
+        assert gh3 is not gh2
+    gh2.session.close.assert_called_once()
+
+
+def test_login_pool_health_github3(mocker):
+    mocker.patch.object(github, "_sessions", [])
+    mocker.patch(
+        "oca_github_bot.github.github3.login",
+        side_effect=lambda token: github3.GitHub(token=token),
+    )
+    mocker.patch(
+        "requests.adapters.HTTPAdapter.send",
+        side_effect=requests.exceptions.ConnectionError("connection reset"),
+    )
+    with pytest.raises(github3.exceptions.ConnectionError):
+        with github.login() as gh:
+            gh.repository("OCA", "some-repo")
+    assert not github._sessions
+
+
+def _response(request, status_code, body=b"", headers=None):
+    response = requests.Response()
+    response.request = request
+    response.url = request.url
+    response.status_code = status_code
+    response.headers.update(headers or {})
+    response._content = body
+    return response
+
+
+def test_conditional_cache(mocker, fake_cache):
+    sent = []
+
+    def send(self, request, **kwargs):
+        sent.append(dict(request.headers))
+        if request.headers.get("If-None-Match") == '"v1"':
+            return _response(request, 304, headers={"X-RateLimit-Remaining": "41"})
+        return _response(
+            request,
+            200,
+            b'{"number": 1}',
+            {"ETag": '"v1"', "Content-Type": "application/json; charset=utf-8"},
+        )
+
+    mocker.patch("requests.adapters.HTTPAdapter.send", send)
+    session = requests.Session()
+    session.mount("https://", http_cache.ConditionalCacheAdapter())
+    url = "https://api.github.com/repos/OCA/mis-builder/pulls/1"
+    assert session.get(url).json() == {"number": 1}
+    assert "If-None-Match" not in sent[0]
+    response = session.get(url)
+    assert sent[1]["If-None-Match"] == '"v1"'
+    assert response.status_code == 200
+    assert response.json() == {"number": 1}
+    assert response.headers["X-RateLimit-Remaining"] == "41"
+    # writes are not cached
+    session.post(url, json={})
+    assert "If-None-Match" not in sent[2]
+
+
+def test_conditional_cache_skip(mocker, fake_cache):
+    mocker.patch.object(config, "GITHUB_HTTP_CACHE_MAX_SIZE", 100)
+    bodies = {
+        "/repos/OCA/mis-builder/pulls/1": b'{"number": 1}',
+        "/search/issues": b'{"items": []}',
+        "/repos/OCA/mis-builder": b'{"description": "%s"}' % (b"x" * 100),
+    }
+
+    def send(self, request, **kwargs):
+        path = request.path_url.split("?")[0]
+        headers = {"ETag": '"v1"', "Content-Type": "application/json"}
+        if request.path_url.endswith("?page=1"):
+            headers["Link"] = '<https://api.github.com/x?page=2>; rel="next"'
+        return _response(request, 200, bodies[path], headers)
+
+    mocker.patch("requests.adapters.HTTPAdapter.send", send)
+    session = requests.Session()
+    session.mount("https://", http_cache.ConditionalCacheAdapter())
+    for path in list(bodies) + ["/repos/OCA/mis-builder/pulls/1?page=1"]:
+        session.get("https://api.github.com" + path)
+    # only the small resource, not paginated, is stored
+    assert len(fake_cache) == 1
+    # and it is forgotten when it can no longer be stored
+    bodies["/repos/OCA/mis-builder/pulls/1"] = b'{"body": "%s"}' % (b"x" * 100)
+    session.get("https://api.github.com/repos/OCA/mis-builder/pulls/1")
+    assert not fake_cache
+
+
+def test_conditional_cache_listing(mocker, fake_cache):
+    sent = []
+
+    def send(self, request, **kwargs):
+        sent.append(dict(request.headers))
+        if request.headers.get("If-None-Match") == '"v1"':
+            return _response(request, 304)
+        return _response(
+            request,
+            200,
+            b'[{"name": "approved"}]',
+            {"ETag": '"v1"', "Content-Type": "application/json"},
+        )
+
+    mocker.patch("requests.adapters.HTTPAdapter.send", send)
+    session = requests.Session()
+    session.mount("https://", http_cache.ConditionalCacheAdapter())
+    url = "https://api.github.com/repos/OCA/mis-builder/issues/1/labels"
+    session.get(url)
+    # a listing on a single page is revalidated
+    response = session.get(url)
+    assert sent[1]["If-None-Match"] == '"v1"'
+    assert response.status_code == 200
+    assert response.json() == [{"name": "approved"}]
+
+
+def test_graphql(mocker):
+    gh = mocker.MagicMock()
+    gh._json.return_value = {"data": {"repository": {"name": "some-repo"}}}
+    data = github.graphql(gh, "query { viewer { login } }", owner="OCA")
+    assert data == {"repository": {"name": "some-repo"}}
+    assert gh._post.call_args.kwargs["data"]["variables"] == {"owner": "OCA"}
+    # the request is sent after the rate limit budget check
+    wait_time = mocker.patch.object(github.ratelimit, "wait_time", return_value=30)
+    task = mocker.patch.object(github, "_worker_task").return_value
+    task.retry.side_effect = Retry()
+    gh._post.reset_mock()
+    with pytest.raises(Retry):
+        github.graphql(gh, "query { viewer { login } }")
+    wait_time.assert_called_once_with(False, "graphql")
+    gh._post.assert_not_called()
+    wait_time.return_value = 0
+    gh._json.return_value = {"data": None, "errors": [{"message": "Not found"}]}
+    with pytest.raises(github.GraphQLError, match="Not found"):
+        github.graphql(gh, "query { viewer { login } }")
+
+
+def test_gh_call_postpone(mocker):
+    mocker.patch.object(github.ratelimit, "wait_time", return_value=30)
+    mocker.patch.object(github, "_worker_task", return_value=delete_branch)
+    apply_async = mocker.patch("celery.Task.apply_async")
+    func = mocker.Mock()
+    # postponements don't count against max_retries
+    delete_branch.push_request(retries=delete_branch.max_retries, called_directly=False)
+    try:
+        with pytest.raises(Retry):
+            github.gh_call(func)
+    finally:
+        delete_branch.pop_request()
+    func.assert_not_called()
+    assert apply_async.call_args.kwargs["countdown"] == 30
+    assert not hasattr(delete_branch, "override_max_retries")
+
+
+def test_temporary_clone_push_url(tmp_path, git_clone, mocker):
+    mocker.patch.object(config, "GITHUB_TOKEN", "s3cr3t")
+    mocker.patch("oca_github_bot.github.appdirs.user_cache_dir", return_value=tmp_path)
+    mocker.patch(
+        "oca_github_bot.github.fetch_repo_cache", return_value=str(tmp_path / "remote")
+    )
+
+    def push_url(checkout_dir):
+        return subprocess.run(
+            ["git", "config", "remote.origin.pushurl"],
+            cwd=checkout_dir,
+            capture_output=True,
+            text=True,
+        ).stdout
+
+    with pytest.raises(RuntimeError):
+        with github.temporary_clone("OCA", "some-repo", "master") as checkout_dir:
+            assert "s3cr3t@github.com" in push_url(checkout_dir)
+            raise RuntimeError()
+    # the token is not kept in the pooled checkout
+    assert not push_url(checkout_dir)
+    config_text = (Path(checkout_dir) / ".git" / "config").read_text()
+    assert "s3cr3t" not in config_text
@@ -1,8 +1,12 @@
+import time
+from email.utils import formatdate
+
 import celery
 import pytest
 import requests
 from github3.exceptions import ForbiddenError
 
+from oca_github_bot import ratelimit
 from oca_github_bot.github import gh_call
 
 
@@ -24,3 +28,65 @@ def test_github_failure(mocker):
     with pytest.raises(ForbiddenError):
         # an unhandled error
         gh_call(_fail_just_like_that)
+
+
+def _fail_ratelimit_str():
+    response = requests.Response()
+    response.status_code = 403
+    response.headers.update({"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": "0"})
+    raise ForbiddenError(response)
+
+
+def _fail_secondary_ratelimit():
+    response = requests.Response()
+    response.status_code = 403
+    response.headers.update({"X-RateLimit-Remaining": "4000", "Retry-After": "60"})
+    raise ForbiddenError(response)
+
+
+def test_github_failure_headers():
+    with pytest.raises(celery.exceptions.Retry):
+        gh_call(_fail_ratelimit_str)
+    with pytest.raises(celery.exceptions.Retry) as e:
+        gh_call(_fail_secondary_ratelimit)
+    assert e.value.when == 60
+
+
+def test_rate_limit_budget(mocker, fake_cache):
+    mocker.patch.object(ratelimit.config, "GITHUB_RATE_LIMIT_RESERVE", 1000)
+    response = requests.Response()
+    response.status_code = 200
+    reset = int(time.time()) + 600
+    response.headers.update(
+        {"X-RateLimit-Remaining": "500", "X-RateLimit-Reset": str(reset)}
+    )
+    ratelimit.record_response(response)
+    # low priority tasks wait for the reset, the others go on
+    assert 590 < ratelimit.wait_time(low_priority=True) <= 601
+    assert ratelimit.wait_time() == 0
+    response.status_code = 403
+    response.headers["Retry-After"] = "30"
+    ratelimit.record_response(response)
+    assert 0 < ratelimit.wait_time() <= 31
+
+
+def test_rate_limit_resources(mocker, fake_cache):
+    response = requests.Response()
+    response.headers.update(
+        {
+            "X-RateLimit-Remaining": "0",
+            "X-RateLimit-Reset": str(int(time.time()) + 600),
+            "X-RateLimit-Resource": "graphql",
+        }
+    )
+    ratelimit.record_response(response)
+    assert ratelimit.wait_time(resource="graphql") > 590
+    assert ratelimit.wait_time() == 0
+
+
+def test_retry_delay_http_date():
+    response = requests.Response()
+    response.headers["Retry-After"] = formatdate(time.time() + 120, usegmt=True)
+    assert 110 < ratelimit.retry_delay(response) <= 121
+    response.headers["Retry-After"] = "soon"
+    assert ratelimit.retry_delay(response) is None
@@ -1,12 +1,17 @@
 # Copyright (c) ACSONE SA/NV 2018
 # Distributed under the MIT License (http://opensource.org/licenses/MIT).
 
+import os
 import subprocess
+import time
 
 import pytest
 
+from oca_github_bot import manifest
 from oca_github_bot.github import git_get_head_sha
 from oca_github_bot.manifest import (
+    AddonIndex,
+    MaintainersMap,
     NoManifestFound,
     OdooSeriesNotDetected,
     bump_manifest_version,
@@ -24,6 +29,8 @@ from oca_github_bot.manifest import (
     set_manifest_version,
 )
 
+from .common import commit_addon, make_addon
+
 
 def test_is_addons_dir_empty(tmpdir):
     tmpdir.mkdir("addon")
@@ -205,6 +212,194 @@ def test_git_modified_addons_merge_base(git_clone):
     assert git_modified_addons(git_clone, "master") == ({"addon1"}, False)
 
 
+def test_git_modified_addons_bare(git_clone, tmp_path):
+    remote = tmp_path / "remote"
+    head_sha = git_get_head_sha(cwd=git_clone)
+    subprocess.check_call(["git", "checkout", "-b", "pr"], cwd=git_clone)
+    addon_dir = git_clone / "addon"
+    addon_dir.mkdir()
+    (addon_dir / "__manifest__.py").write_text("{'name': 'the addon'}")
+    subprocess.check_call(["git", "add", "addon"], cwd=git_clone)
+    subprocess.check_call(["git", "commit", "-m", "[BOT] add addon"], cwd=git_clone)
+    subprocess.check_call(["git", "push", "origin", "pr"], cwd=git_clone)
+    assert git_modified_addons(remote, "master", "pr") == ({"addon"}, False)
+    # the working tree of the clone is not touched
+    subprocess.check_call(["git", "checkout", "master"], cwd=git_clone)
+    assert git_modified_addons(git_clone, "master", "pr") == ({"addon"}, False)
+    assert git_get_head_sha(cwd=git_clone) == head_sha
+    # a conflicting change on master
+    addon_dir.mkdir()
+    (addon_dir / "__manifest__.py").write_text("{'name': 'conflict'}")
+    subprocess.check_call(["git", "add", "addon"], cwd=git_clone)
+    subprocess.check_call(["git", "commit", "-m", "[BOT] conflict"], cwd=git_clone)
+    with pytest.raises(subprocess.CalledProcessError):
+        git_modified_addons(git_clone, "master", "pr")
+
+
+def test_git_modified_addons_many_files(git_clone, mocker):
+    addon_dir = git_clone / "addon"
+    (addon_dir / "i18n").mkdir(parents=True)
+    (addon_dir / "__manifest__.py").write_text("{'name': 'the addon'}")
+    for i in range(100):
+        (addon_dir / "i18n" / f"lang{i}.po").write_text("")
+    setup_dir = git_clone / "setup" / "addon" / "odoo" / "addons"
+    setup_dir.mkdir(parents=True)
+    (setup_dir / "addon").symlink_to("../../../../addon")
+    (git_clone / "notanaddon").mkdir()
+    (git_clone / "notanaddon" / "file").write_text("")
+    subprocess.check_call(["git", "add", "."], cwd=git_clone)
+    subprocess.check_call(["git", "commit", "-m", "[BOT] add addon"], cwd=git_clone)
+    check_output_spy = mocker.spy(manifest, "check_output")
+    assert git_modified_addons(git_clone, "origin/master") == ({"addon"}, True)
+    # merge-tree, diff-tree and ls-tree
+    assert check_output_spy.call_count == 3
+
+
+def test_addon_index(git_clone, tmp_path, mocker):
+    remote = tmp_path / "remote"
+    index_dir = tmp_path / "index"
+    make_addon(git_clone, "addon1", maintainers=["themaintainer"])
+    commit_addon(git_clone, "addon1")
+    make_addon(git_clone, "addon2", installable=False)
+    (git_clone / "addon2" / "__openerp__.py").write_text("{'name': 'old'}")
+    commit_addon(git_clone, "addon2")
+    (git_clone / "notanaddon").mkdir()
+    (git_clone / "notanaddon" / "file").write_text("")
+    commit_addon(git_clone, "notanaddon")
+    subprocess.check_call(["git", "push", "origin", "master"], cwd=git_clone)
+    index = AddonIndex.from_tree(remote, "master", index_dir)
+    assert index.addon_names() == ["addon1", "addon2"]
+    assert index.addon_names(installable_only=True) == ["addon1"]
+    assert index.get_manifest_path("addon2") == "addon2/__manifest__.py"
+    assert index.get_manifest("addon2")["name"] == "addon2"
+    assert index.get_maintainers("addon1") == ["themaintainer"]
+    assert index.is_maintainer("themaintainer", ["addon1"])
+    assert not index.is_maintainer("themaintainer", ["addon1", "addon2"])
+    assert not index.is_maintainer("themaintainer", ["notanaddon"])
+    with pytest.raises(NoManifestFound):
+        index.get_manifest("notanaddon")
+    # the index is loaded from disk, without reading the tree again
+    assert (index_dir / f"{index.tree_sha}.json").exists()
+    build_spy = mocker.spy(AddonIndex, "_build")
+    index2 = AddonIndex.from_tree(git_clone, "HEAD", index_dir)
+    assert index2.tree_sha == index.tree_sha
+    assert index2.addons == index.addons
+    build_spy.assert_not_called()
+    # an empty tree has no addons
+    assert not AddonIndex.from_tree(remote, "master~3", index_dir)
+
+
+def test_addon_index_for_branch(git_clone, tmp_path, mocker):
+    index_dir = tmp_path / "index"
+    make_addon(git_clone, "addon1")
+    commit_addon(git_clone, "addon1")
+    make_addon(git_clone, "addon2")
+    commit_addon(git_clone, "addon2")
+    index = AddonIndex.for_branch(git_clone, "key", "HEAD", index_dir)
+    assert index.addon_names() == ["addon1", "addon2"]
+    # modify addon1 manifest, remove addon2, add addon3
+    (git_clone / "addon1" / "__manifest__.py").write_text(
+        "{'name': 'addon1', 'maintainers': ['themaintainer']}"
+    )
+    commit_addon(git_clone, "addon1")
+    subprocess.check_call(["git", "rm", "-r", "addon2"], cwd=git_clone)
+    subprocess.check_call(["git", "commit", "-m", "[BOT] rm addon2"], cwd=git_clone)
+    make_addon(git_clone, "addon3")
+    commit_addon(git_clone, "addon3")
+    build_spy = mocker.spy(AddonIndex, "_build")
+    read_blobs_spy = mocker.spy(manifest.git_cache, "read_blobs")
+    index = AddonIndex.for_branch(git_clone, "key", "HEAD", index_dir)
+    build_spy.assert_not_called()
+    # only the modified and new manifests are read
+    assert sorted(read_blobs_spy.call_args[0][1]) == sorted(
+        [_blob(git_clone, "addon1"), _blob(git_clone, "addon3")]
+    )
+    assert index.addon_names() == ["addon1", "addon3"]
+    assert index.get_maintainers("addon1") == ["themaintainer"]
+    assert index.addons == AddonIndex._build(git_clone, index.tree_sha).addons
+
+
+def test_addon_index_for_branch_missing_base(git_clone, tmp_path):
+    index_dir = tmp_path / "index"
+    make_addon(git_clone, "addon1")
+    commit_addon(git_clone, "addon1")
+    # the branch pointer refers to a tree that is not in the repository
+    missing_tree = "1" * 40
+    AddonIndex(missing_tree, {})._save(index_dir)
+    (index_dir / "branches").mkdir()
+    (index_dir / "branches" / "key").write_text(missing_tree)
+    index = AddonIndex.for_branch(git_clone, "key", "HEAD", index_dir)
+    assert index.addon_names() == ["addon1"]
+    assert (index_dir / "branches" / "key").read_text() == index.tree_sha
+
+
+def test_addon_index_eviction(git_clone, tmp_path):
+    index_dir = tmp_path / "index"
+    make_addon(git_clone, "addon1")
+    commit_addon(git_clone, "addon1")
+    index1 = AddonIndex.for_branch(git_clone, "key", "HEAD", index_dir)
+    AddonIndex.for_branch(git_clone, "other", "HEAD", index_dir)
+    make_addon(git_clone, "addon2")
+    commit_addon(git_clone, "addon2")
+    index2 = AddonIndex.for_branch(git_clone, "key", "HEAD", index_dir)
+    # the previous head of key is still the head of other
+    assert (index_dir / f"{index1.tree_sha}.json").exists()
+    AddonIndex.for_branch(git_clone, "other", "HEAD", index_dir)
+    assert not (index_dir / f"{index1.tree_sha}.json").exists()
+    # indexes that are not used anymore are removed after a while
+    old = time.time() - manifest.ADDON_INDEX_MAX_AGE - 1
+    os.utime(index_dir / f"{index2.tree_sha}.json", (old, old))
+    AddonIndex.from_tree(git_clone, "HEAD~1", index_dir)
+    assert not (index_dir / f"{index2.tree_sha}.json").exists()
+
+
+def _blob(git_clone, addon_name):
+    return subprocess.check_output(
+        ["git", "rev-parse", f"HEAD:{addon_name}/__manifest__.py"],
+        cwd=git_clone,
+        text=True,
+    ).strip()
+
+
+def test_maintainers_map(git_clone, tmp_path, mocker):
+    index_dir = tmp_path / "index"
+    make_addon(git_clone, "addon1", maintainers=["themaintainer"])
+    make_addon(git_clone, "addon2", maintainers=["other"], installable=False)
+    commit_addon(git_clone, "addon1")
+    commit_addon(git_clone, "addon2")
+    maintainers_map = MaintainersMap.for_branch(git_clone, "key", "HEAD", index_dir)
+    assert maintainers_map.is_maintainer("themaintainer", ["addon1"])
+    assert not maintainers_map.is_maintainer("themaintainer", ["addon1", "addon2"])
+    assert not maintainers_map.is_maintainer("themaintainer", ["notanaddon"])
+    assert maintainers_map.get_maintainers(["addon1", "addon2", "notanaddon"]) == {
+        "addon1": {"themaintainer"},
+        "addon2": {"other"},
+    }
+    assert maintainers_map.get_maintainers(
+        ["addon1", "addon2"], installable_only=True
+    ) == {"addon1": {"themaintainer"}}
+    # the map is kept in memory while the branch head does not move
+    for_branch_spy = mocker.spy(AddonIndex, "for_branch")
+    assert (
+        MaintainersMap.for_branch(git_clone, "key", "HEAD", index_dir)
+        is maintainers_map
+    )
+    for_branch_spy.assert_not_called()
+    (git_clone / "addon2" / "__manifest__.py").write_text(
+        "{'name': 'addon2', 'maintainers': ['themaintainer']}"
+    )
+    commit_addon(git_clone, "addon2")
+    maintainers_map = MaintainersMap.for_branch(git_clone, "key", "HEAD", index_dir)
+    for_branch_spy.assert_called_once()
+    assert maintainers_map.is_maintainer("themaintainer", ["addon1", "addon2"])
+    # only the maps of the most recently used branches are kept
+    mocker.patch("oca_github_bot.manifest.MAINTAINERS_MAPS_MAX", 2)
+    MaintainersMap.for_branch(git_clone, "key2", "HEAD", index_dir)
+    MaintainersMap.for_branch(git_clone, "key", "HEAD", index_dir)
+    MaintainersMap.for_branch(git_clone, "key3", "HEAD", index_dir)
+    assert list(MaintainersMap._maps) == ["key", "key3"]
+
+
 def test_get_odoo_series_from_branch():
     assert get_odoo_series_from_branch("12.0") == (12, 0)
     with pytest.raises(OdooSeriesNotDetected):
@@ -249,3 +444,41 @@ def test_is_maintainer_other_branches():
     assert not is_maintainer_other_branches(
         "OCA", "mis-builder", "fpdoo", {"mis_builder"}, ["12.0"]
     )
+
+
+def test_is_maintainer_other_branches_local(git_clone, mocker):
+    make_addon(git_clone, "addon1", maintainers=["themaintainer"])
+    commit_addon(git_clone, "addon1")
+    subprocess.check_call(["git", "push", "origin", "master:12.0"], cwd=git_clone)
+    subprocess.check_call(["git", "fetch", "origin"], cwd=git_clone)
+    raw_mock = mocker.patch("oca_github_bot.manifest._is_maintainer_raw")
+    assert is_maintainer_other_branches(
+        "OCA", "repo", "themaintainer", {"addon1"}, ["12.0"], repo_dir=git_clone
+    )
+    assert not is_maintainer_other_branches(
+        "OCA", "repo", "other", {"addon1"}, ["12.0"], repo_dir=git_clone
+    )
+    raw_mock.assert_not_called()
+    # 13.0 is not available locally
+    raw_mock.return_value = True
+    assert is_maintainer_other_branches(
+        "OCA", "repo", "other", {"addon1"}, ["12.0", "13.0"], repo_dir=git_clone
+    )
+    raw_mock.assert_called_once_with(
+        mocker.ANY, "OCA", "repo", "other", "addon1", "13.0"
+    )
+
+
+def test_is_maintainer_other_branches_concurrent(mocker):
+    def is_maintainer_raw(session, org, repo, username, addon, branch):
+        return (addon, branch) in {("addon1", "13.0"), ("addon2", "12.0")}
+
+    mocker.patch(
+        "oca_github_bot.manifest._is_maintainer_raw", side_effect=is_maintainer_raw
+    )
+    assert is_maintainer_other_branches(
+        "OCA", "repo", "user", {"addon1", "addon2"}, ["12.0", "13.0", "14.0"]
+    )
+    assert not is_maintainer_other_branches(
+        "OCA", "repo", "user", {"addon1", "addon3"}, ["12.0", "13.0", "14.0"]
+    )
@@ -1,12 +1,10 @@
 # Copyright 2019 Simone Rubino - Agile Business Group
 # Distributed under the MIT License (http://opensource.org/licenses/MIT).
-import shutil
-
 import pytest
 
 from oca_github_bot.tasks.mention_maintainer import mention_maintainer
 
-from .common import make_addon, set_config
+from .common import commit_addon, make_addon, set_config
 
 
 @pytest.mark.vcr()
@@ -16,6 +14,7 @@ def test_maintainer_mentioned(git_clone, mocker):
 
     addon_name = "addon1"
     addon_dir = make_addon(git_clone, addon_name, maintainers=["themaintainer"])
+    commit_addon(git_clone, addon_name)
 
     modified_addons_mock = mocker.patch(
         "oca_github_bot.tasks.mention_maintainer.git_modified_addon_dirs"
@@ -35,25 +34,18 @@ def test_added_maintainer_not_mentioned(git_clone, mocker):
     github_mock.temporary_clone.return_value.__enter__.return_value = str(git_clone)
 
     addon_name = "addon1"
-    pre_pr_addon = make_addon(git_clone, addon_name, maintainers=["themaintainer"])
-    pre_pr_addon_mock = mocker.patch(
-        "oca_github_bot.tasks.mention_maintainer.addon_dirs_in"
-    )
-
-    def pr_edited_addon(_args, **_kwargs):
-        shutil.rmtree(pre_pr_addon)
-        edited_addon = make_addon(
-            git_clone, addon_name, maintainers=["themaintainer", "added_maintainer"]
-        )
-        return [str(edited_addon)]
+    addon_dir = make_addon(git_clone, addon_name, maintainers=["themaintainer"])
+    commit_addon(git_clone, addon_name)
 
-    pre_pr_addon_mock.side_effect = pr_edited_addon
-    pre_pr_addon_mock.return_value = [pre_pr_addon], False
+    # the PR adds a maintainer
+    (git_clone / addon_name / "__manifest__.py").write_text(
+        repr(dict(name=addon_name, maintainers=["themaintainer", "added_maintainer"]))
+    )
 
     modified_addons_mock = mocker.patch(
         "oca_github_bot.tasks.mention_maintainer.git_modified_addon_dirs"
     )
-    modified_addons_mock.return_value = [pre_pr_addon], False, {addon_name}
+    modified_addons_mock.return_value = [addon_dir], False, {addon_name}
 
     mocker.patch("oca_github_bot.tasks.mention_maintainer.check_call")
 
@@ -61,7 +53,7 @@ def test_added_maintainer_not_mentioned(git_clone, mocker):
 
     github_mock.gh_call.assert_called_once()
     assert "@themaintainer" in github_mock.gh_call.mock_calls[0][1][1]
-    assert "@added_maintainer" in github_mock.gh_call.mock_calls[0][1][1]
+    assert "@added_maintainer" not in github_mock.gh_call.mock_calls[0][1][1]
 
 
 @pytest.mark.vcr()
@@ -74,6 +66,7 @@ def test_multi_maintainer_one_mention(git_clone, mocker):
     themaintainer = "themaintainer"
     for addon_name in addon_names:
         addon_dir = make_addon(git_clone, addon_name, maintainers=[themaintainer])
+        commit_addon(git_clone, addon_name)
         addon_dirs.append(addon_dir)
 
     modified_addons_mock = mocker.patch(
@@ -100,6 +93,7 @@ def test_pr_by_maintainer_no_mention(git_clone, mocker):
     addon_names = ["addon1", "addon2"]
     for addon_name in addon_names:
         addon_dir = make_addon(git_clone, addon_name, maintainers=[themaintainer])
+        commit_addon(git_clone, addon_name)
         addon_dirs.append(addon_dir)
 
     modified_addons_mock = mocker.patch(
@@ -119,6 +113,7 @@ def test_no_maintainer_adopt_module(git_clone, mocker):
 
     addon_name = "addon1"
     addon_dir = make_addon(git_clone, addon_name)
+    commit_addon(git_clone, addon_name)
 
     modified_addons_mock = mocker.patch(
         "oca_github_bot.tasks.mention_maintainer.git_modified_addon_dirs"
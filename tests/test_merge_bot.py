@@ -5,7 +5,10 @@ import subprocess
 
 import pytest
 
+from oca_github_bot.github import github_user_can_push, invalidate_user_permissions
 from oca_github_bot.manifest import user_can_push
+from oca_github_bot.tasks.merge_bot import merge_bot_status
+from oca_github_bot.version_branch import make_merge_bot_branch
 
 from .common import commit_addon, make_addon
 
@@ -50,3 +53,43 @@ def test_user_can_merge_not_maintainer_hacker(git_clone, gh):
     assert not user_can_push(
         gh, "OCA", "mis-builder", "themaintainer", git_clone, "master"
     )
+
+
+def test_github_user_permission_cache(mocker, fake_cache):
+    gh_repo = mocker.MagicMock()
+    gh_repo.owner.login = "OCA"
+    gh_repo.name = "some-repo"
+    gh_repo._json.return_value = {"permission": "write"}
+    assert github_user_can_push(gh_repo, "someone")
+    assert github_user_can_push(gh_repo, "SomeOne")
+    assert gh_repo._get.call_count == 1
+    gh_repo._json.return_value = {"permission": "read"}
+    invalidate_user_permissions("OCA")
+    assert not github_user_can_push(gh_repo, "someone")
+    assert gh_repo._get.call_count == 2
+
+
+def _mock_merge_bot_status_github(mocker, head_sha):
+    gh = mocker.MagicMock()
+    mocker.patch("oca_github_bot.github.login").return_value.__enter__.return_value = gh
+    mocker.patch(
+        "oca_github_bot.tasks.merge_bot.load_pr_snapshot"
+    ).return_value.branch_sha = head_sha
+    return mocker.patch("oca_github_bot.github.temporary_clone")
+
+
+def test_merge_bot_status_outdated_sha(mocker):
+    temporary_clone = _mock_merge_bot_status_github(mocker, "2" * 40)
+    merge_bot_branch = make_merge_bot_branch(42, "12.0", "toto", "patch")
+    merge_bot_status("OCA", "some-repo", merge_bot_branch, "1" * 40)
+    temporary_clone.assert_not_called()
+
+
+def test_merge_bot_status_pending(mocker):
+    temporary_clone = _mock_merge_bot_status_github(mocker, "1" * 40)
+    mocker.patch(
+        "oca_github_bot.tasks.merge_bot._get_commit_success"
+    ).return_value = None
+    merge_bot_branch = make_merge_bot_branch(42, "12.0", "toto", "patch")
+    merge_bot_status("OCA", "some-repo", merge_bot_branch, "1" * 40)
+    temporary_clone.assert_not_called()
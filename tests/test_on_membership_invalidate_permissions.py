@@ -0,0 +1,27 @@
+# Copyright (c) ACSONE SA/NV 2026
+# Distributed under the MIT License (http://opensource.org/licenses/MIT).
+
+import pytest
+
+from oca_github_bot.webhooks import on_membership_invalidate_permissions
+
+from .common import EventMock
+
+
+@pytest.mark.asyncio
+async def test_on_membership_invalidate_permissions(mocker):
+    invalidate_mock = mocker.patch(
+        "oca_github_bot.webhooks.on_membership_invalidate_permissions."
+        "invalidate_user_permissions"
+    )
+    event = EventMock(
+        data={
+            "action": "added",
+            "repository": {"full_name": "OCA/some-repo", "owner": {"login": "OCA"}},
+            "member": {"login": "someone"},
+        }
+    )
+    await on_membership_invalidate_permissions.on_membership_invalidate_permissions(
+        event, None
+    )
+    invalidate_mock.assert_called_once_with("OCA")
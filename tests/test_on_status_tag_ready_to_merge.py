@@ -0,0 +1,62 @@
+# Copyright (c) ACSONE SA/NV 2026
+# Distributed under the MIT License (http://opensource.org/licenses/MIT).
+
+import pytest
+
+from oca_github_bot.version_branch import make_merge_bot_branch
+from oca_github_bot.webhooks import on_status_tag_ready_to_merge
+
+from .common import EventMock
+
+
+@pytest.fixture
+def delay(mocker):
+    return mocker.patch(
+        "oca_github_bot.webhooks.on_status_tag_ready_to_merge."
+        "tag_ready_to_merge.delay"
+    )
+
+
+def _check_suite_event(conclusion, branch="feature"):
+    return EventMock(
+        data={
+            "repository": {"full_name": "OCA/some-repo"},
+            "check_suite": {
+                "head_branch": branch,
+                "head_sha": "1" * 40,
+                "conclusion": conclusion,
+                "app": {"name": "GitHub Actions"},
+            },
+        }
+    )
+
+
+@pytest.mark.asyncio
+async def test_on_check_suite_tag_ready_to_merge(delay):
+    handler = on_status_tag_ready_to_merge.on_check_suite_tag_ready_to_merge
+    await handler(_check_suite_event("failure"), None)
+    merge_bot_branch = make_merge_bot_branch(1, "16.0", "someone", "patch")
+    await handler(_check_suite_event("success", merge_bot_branch), None)
+    delay.assert_not_called()
+    await handler(_check_suite_event("success"), None)
+    delay.assert_called_once_with("OCA", "some-repo", sha="1" * 40)
+
+
+@pytest.mark.asyncio
+async def test_on_status_tag_ready_to_merge(delay):
+    handler = on_status_tag_ready_to_merge.on_status_tag_ready_to_merge
+    data = {
+        "repository": {"full_name": "OCA/some-repo"},
+        "sha": "1" * 40,
+        "state": "pending",
+        "context": "ci/travis",
+    }
+    await handler(EventMock(data=data), None)
+    # ignored status
+    await handler(
+        EventMock(data=dict(data, state="success", context="ci/runbot")), None
+    )
+    delay.assert_not_called()
+    data["state"] = "success"
+    await handler(EventMock(data=data), None)
+    delay.assert_called_once_with("OCA", "some-repo", sha="1" * 40)
@@ -0,0 +1,114 @@
+# Copyright (c) ACSONE SA/NV 2026
+# Distributed under the MIT License (http://opensource.org/licenses/MIT).
+
+from oca_github_bot.pr_snapshot import (
+    _CHECK_SUITES_QUERY,
+    _LABELS_QUERY,
+    _PR_SNAPSHOT_QUERY,
+    _REVIEWS_QUERY,
+    load_pr_snapshot,
+)
+from oca_github_bot.tasks.merge_bot import _get_commit_success
+
+from .common import (
+    graphql_commit,
+    graphql_page,
+    graphql_repository,
+    graphql_reviews,
+)
+
+
+def test_load_pr_snapshot(mocker):
+    graphql = mocker.patch("oca_github_bot.github.graphql")
+    graphql.return_value = graphql_repository(
+        [
+            ("alice", "APPROVED"),
+            ("bob", "CHANGES_REQUESTED"),
+            ("bob", "APPROVED"),
+            ("carol", "CHANGES_REQUESTED"),
+            ("carol", "DISMISSED"),
+        ],
+        labels=["approved"],
+    )
+    snapshot = load_pr_snapshot(mocker.MagicMock(), "OCA", "some-repo", "42")
+    assert graphql.call_args.kwargs["number"] == 42
+    assert not graphql.call_args.kwargs["withRef"]
+    assert snapshot.mergeable
+    assert snapshot.labels == {"approved"}
+    assert snapshot.reviewers("APPROVED") == {"alice", "bob"}
+    assert not snapshot.reviewers("CHANGES_REQUESTED")
+    assert snapshot.checks.sha == "1" * 40
+    assert snapshot.checks.statuses[0].state == "success"
+    assert snapshot.branch_sha is None
+    # comments, which would push older reviews out of the page, are not loaded
+    assert "states: [APPROVED, CHANGES_REQUESTED, DISMISSED]" in _PR_SNAPSHOT_QUERY
+
+
+def test_load_pr_snapshot_pages(mocker):
+    graphql = mocker.patch("oca_github_bot.github.graphql")
+    first = graphql_repository(
+        [("bob", "APPROVED"), ("alice", "APPROVED")], reviews_cursor="r1"
+    )
+    first["repository"]["pullRequest"]["labels"] = graphql_page([{"name": "a"}], "l1")
+    commit = first["repository"]["pullRequest"]["commits"]["nodes"][0]["commit"]
+    commit["checkSuites"] = graphql_page([], "c1")
+    pages = {
+        _REVIEWS_QUERY: {
+            "r1": graphql_page(
+                graphql_reviews([("carol", "CHANGES_REQUESTED")]), "r2", True
+            ),
+            "r2": graphql_page(graphql_reviews([("bob", "CHANGES_REQUESTED")])),
+        },
+        _LABELS_QUERY: {"l1": graphql_page([{"name": "b"}])},
+        _CHECK_SUITES_QUERY: {
+            "c1": graphql_page(
+                [
+                    {
+                        "app": {"name": "GitHub Actions"},
+                        "conclusion": "FAILURE",
+                        "checkRuns": {"totalCount": 1},
+                    }
+                ]
+            )
+        },
+    }
+
+    def query(gh, query, **variables):
+        if query == _PR_SNAPSHOT_QUERY:
+            return first
+        page = pages[query][variables.get("after") or variables.get("before")]
+        if query == _CHECK_SUITES_QUERY:
+            return {"repository": {"object": {"checkSuites": page}}}
+        key = "reviews" if query == _REVIEWS_QUERY else "labels"
+        return {"repository": {"pullRequest": {key: page}}}
+
+    graphql.side_effect = query
+    snapshot = load_pr_snapshot(mocker.MagicMock(), "OCA", "some-repo", 42)
+    # older reviews are loaded before the later ones
+    assert snapshot.reviewers("APPROVED") == {"alice", "bob"}
+    assert snapshot.reviewers("CHANGES_REQUESTED") == {"carol"}
+    assert snapshot.labels == {"a", "b"}
+    assert snapshot.checks.check_suites[0].conclusion == "failure"
+
+
+def test_load_pr_snapshot_commit(mocker):
+    graphql = mocker.patch("oca_github_bot.github.graphql")
+    graphql.return_value = graphql_repository(
+        [],
+        ref={"target": {"oid": "2" * 40}},
+        object=graphql_commit(
+            "2" * 40,
+            [("ci/runbot", "FAILURE"), ("ci/travis", "SUCCESS")],
+            [("Codecov", None, 1), ("GitHub Actions", None, 2)],
+        ),
+    )
+    snapshot = load_pr_snapshot(
+        mocker.MagicMock(), "OCA", "some-repo", 42, branch="b", sha="2" * 40
+    )
+    assert graphql.call_args.kwargs["ref"] == "refs/heads/b"
+    assert snapshot.branch_sha == "2" * 40
+    assert snapshot.checks.sha == "2" * 40
+    # ci/runbot and Codecov are ignored, GitHub Actions is in progress
+    assert _get_commit_success("OCA", "some-repo", 42, snapshot.checks) is None
+    snapshot.checks.check_suites[1].conclusion = "success"
+    assert _get_commit_success("OCA", "some-repo", 42, snapshot.checks)
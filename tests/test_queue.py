@@ -0,0 +1,136 @@
+# Copyright (c) ACSONE SA/NV 2026
+# Distributed under the MIT License (http://opensource.org/licenses/MIT).
+
+import threading
+
+import pytest
+
+from oca_github_bot import queue
+from oca_github_bot.tasks.delete_branch import delete_branch
+from oca_github_bot.tasks.main_branch_bot import (
+    main_branch_bot,
+    main_branch_bot_all_repos,
+)
+
+
+def test_collect_publishes(mocker):
+    apply_async = mocker.patch("celery.Task.apply_async")
+    with queue.collect_publishes() as publishes:
+        result = delete_branch.delay("OCA", "some-repo", "branch")
+    apply_async.assert_not_called()
+    assert publishes[0][3]["task_id"] == result.id
+    mocker.patch.object(queue.app, "producer_or_acquire")
+    queue.publish_batch(publishes)
+    apply_async.assert_called_once()
+    assert apply_async.call_args.args[1:3] == (("OCA", "some-repo", "branch"), {})
+    assert apply_async.call_args.kwargs["task_id"] == result.id
+
+
+@pytest.mark.asyncio
+async def test_enqueue(mocker):
+    delay = mocker.patch.object(delete_branch, "delay")
+    main_thread = threading.get_ident()
+    delay.side_effect = lambda *args: threading.get_ident()
+    # published from another thread
+    assert await queue.enqueue(delete_branch, "OCA", "repo", "branch") != main_thread
+    # collected in the event loop thread
+    with queue.collect_publishes():
+        assert await queue.enqueue(delete_branch, "OCA", "repo", "b") == main_thread
+    assert delay.call_count == 2
+
+
+def test_publish_batch_dedup(mocker, fake_cache):
+    apply_async = mocker.patch("celery.Task.apply_async")
+    mocker.patch.object(queue.app, "producer_or_acquire")
+    with queue.collect_publishes() as publishes:
+        delete_branch.delay("OCA", "some-repo", "branch")
+        delete_branch.delay("OCA", "some-repo", "branch")
+        delete_branch.delay("OCA", "some-repo", "other-branch")
+    queue.publish_batch(publishes)
+    assert apply_async.call_count == 2
+    with queue.collect_publishes() as publishes:
+        delete_branch.delay("OCA", "some-repo", "branch")
+    queue.publish_batch(publishes)
+    assert apply_async.call_count == 2
+    # once the task has started, it can be queued again
+    mocker.patch("oca_github_bot.tasks.delete_branch.github")
+    delete_branch.apply(("OCA", "some-repo", "branch"))
+    queue.publish_batch(publishes)
+    assert apply_async.call_count == 3
+
+
+def test_publish_batch_failure(mocker, fake_cache):
+    apply_async = mocker.patch("celery.Task.apply_async")
+    apply_async.side_effect = [None, ConnectionError("broker down"), None, None]
+    mocker.patch.object(queue.app, "producer_or_acquire")
+    with queue.collect_publishes() as publishes:
+        delete_branch.delay("OCA", "some-repo", "branch")
+        delete_branch.delay("OCA", "some-repo", "other-branch")
+    with pytest.raises(ConnectionError):
+        queue.publish_batch(publishes)
+    # the task that was not published is not a duplicate when retried
+    queue.publish_batch(publishes)
+    assert apply_async.call_count == 3
+    assert apply_async.call_args.args[1] == ("OCA", "some-repo", "other-branch")
+
+
+def test_debounce(mocker, fake_cache):
+    mocker.patch.object(delete_branch, "debounce", 30)
+    apply_async = mocker.patch("celery.Task.apply_async")
+    delete_branch.delay("OCA", "some-repo", "branch")
+    delete_branch.delay("OCA", "some-repo", "branch")
+    assert apply_async.call_count == 2
+    (_, first_kwargs), first_options = apply_async.call_args_list[0]
+    (_, second_kwargs), _ = apply_async.call_args_list[1]
+    assert first_options["countdown"] == 30
+    assert first_kwargs[queue.DEBOUNCE_TOKEN] != second_kwargs[queue.DEBOUNCE_TOKEN]
+    run = mocker.patch.object(delete_branch, "run")
+    mocker.patch.object(delete_branch.request, "called_directly", False)
+    # the first task was replaced by the second one
+    delete_branch("OCA", "some-repo", "branch", **first_kwargs)
+    run.assert_not_called()
+    delete_branch("OCA", "some-repo", "branch", **second_kwargs)
+    run.assert_called_once_with("OCA", "some-repo", "branch")
+
+
+def test_route_task(mocker):
+    from oca_github_bot.tasks.main_branch_bot import main_branch_bot
+    from oca_github_bot.tasks.rebase_bot import rebase_bot_start
+
+    def route(task, args, kwargs):
+        router = queue.app.amqp.router
+        return router.route({}, task.name, args, kwargs, task)["queue"].name
+
+    assert route(rebase_bot_start, ("OCA", "mis-builder", 1, "u"), {}) == "celery"
+    mocker.patch.object(queue.config, "GIT_LANES", 4)
+    lane = queue.lane_queue("OCA", "mis-builder")
+    assert lane in {f"git-lane-{i}" for i in range(4)}
+    assert route(rebase_bot_start, ("OCA", "mis-builder", 1, "u"), {}) == lane
+    main_branch_bot_kwargs = dict(org="oca", repo="Mis-Builder", branch="16.0")
+    assert route(main_branch_bot, (), main_branch_bot_kwargs) == lane
+    # tasks that do not modify repositories do not go to lanes
+    assert route(delete_branch, ("OCA", "mis-builder", "branch"), {}) == "celery"
+
+
+def test_low_priority_inherited(mocker):
+    gh = mocker.MagicMock()
+    mocker.patch("oca_github_bot.github.login").return_value.__enter__.return_value = gh
+    repo = mocker.MagicMock(fork=False)
+    repo.name = "some-repo"
+    repo.branches.return_value = [mocker.MagicMock()]
+    repo.branches.return_value[0].name = "16.0"
+    gh.repositories_by.return_value = [repo]
+    apply_async = mocker.patch("celery.Task.apply_async")
+    main_branch_bot_all_repos.apply(("OCA", False))
+    # the tasks queued by the nightly fan-out leave the budget to others
+    headers = apply_async.call_args.kwargs["headers"]
+    main_branch_bot.push_request(called_directly=False, headers=headers)
+    try:
+        assert queue.is_low_priority(main_branch_bot)
+    finally:
+        main_branch_bot.pop_request()
+    main_branch_bot.push_request(called_directly=False)
+    try:
+        assert not queue.is_low_priority(main_branch_bot)
+    finally:
+        main_branch_bot.pop_request()
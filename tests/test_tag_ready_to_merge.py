@@ -0,0 +1,190 @@
+# Copyright (c) ACSONE SA/NV 2026
+# Distributed under the MIT License (http://opensource.org/licenses/MIT).
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from oca_github_bot import config
+from oca_github_bot.tasks import tag_ready_to_merge as tag_ready_to_merge_module
+from oca_github_bot.tasks.tag_approved import tag_approved
+from oca_github_bot.tasks.tag_ready_to_merge import tag_ready_to_merge
+
+from .common import graphql_repository
+
+
+def _pr(number, label_id="L1"):
+    return {
+        "id": f"PR{number}",
+        "url": f"https://github.com/OCA/some-repo/pull/{number}",
+        "number": number,
+        "repository": {
+            "name": "some-repo",
+            "label": {"id": label_id} if label_id else None,
+        },
+    }
+
+
+@pytest.fixture(autouse=True)
+def bot_tasks(mocker):
+    mocker.patch.object(config, "BOT_TASKS", ["all"])
+    mocker.patch.object(config, "BOT_TASKS_DISABLED", [])
+
+
+@pytest.fixture
+def sweep(mocker, fake_cache):
+    gh = mocker.MagicMock()
+    mocker.patch("oca_github_bot.github.login").return_value.__enter__.return_value = gh
+    found = []
+    mutations = []
+
+    def graphql(gh, query, **variables):
+        if query.startswith("mutation"):
+            mutations.append((query, variables))
+            return {}
+        return {
+            "search": {
+                "pageInfo": {"hasNextPage": False, "endCursor": None},
+                "nodes": found,
+            }
+        }
+
+    return mocker.patch("oca_github_bot.github.graphql", side_effect=graphql), (
+        gh,
+        found,
+        mutations,
+    )
+
+
+def test_sweep(sweep, mocker):
+    graphql, (gh, found, mutations) = sweep
+    found += [_pr(1), _pr(2), _pr(3, label_id=None)]
+    tag_ready_to_merge("OCA")
+    # first sweep: full search
+    (search,) = (c for c in graphql.call_args_list if "searchQuery" in c.kwargs)
+    assert "org:OCA" in search.kwargs["searchQuery"]
+    assert "created:<" in search.kwargs["searchQuery"]
+    # the label does not exist in the repository of PR 3, the REST API creates it
+    gh.issue.assert_called_once_with("OCA", "some-repo", 3)
+    gh.issue.return_value.add_labels.assert_called_once_with("ready to merge")
+    # the others are labelled and commented in one mutation
+    ((mutation, variables),) = mutations
+    assert mutation.count("addLabelsToLabelable") == 2
+    assert mutation.count("addComment") == 2
+    assert variables["pr0"] == "PR1" and variables["label1"] == "L1"
+    # second sweep: incremental, the search index still returns PR 1
+    graphql.reset_mock()
+    found[:] = [_pr(1), _pr(4)]
+    tag_ready_to_merge("OCA")
+    queries = [
+        c.kwargs["searchQuery"]
+        for c in graphql.call_args_list
+        if "searchQuery" in c.kwargs
+    ]
+    assert len(queries) == 2
+    assert "created:<" not in queries[0] and ".." in queries[0]
+    assert "updated:>=" in queries[1]
+    (mutation, variables) = mutations[1]
+    assert mutation.count("addComment") == 1
+    assert variables["pr0"] == "PR4"
+    # a full sweep is done again after FULL_SWEEP_INTERVAL
+    graphql.reset_mock()
+    mocker.patch.object(
+        tag_ready_to_merge_module,
+        "datetime",
+        mocker.Mock(
+            utcnow=lambda: datetime.utcnow() + timedelta(days=2),
+            fromisoformat=datetime.fromisoformat,
+        ),
+    )
+    tag_ready_to_merge("OCA")
+    queries = [
+        c.kwargs["searchQuery"]
+        for c in graphql.call_args_list
+        if "searchQuery" in c.kwargs
+    ]
+    assert len(queries) == 1 and "created:<" in queries[0]
+
+
+def test_sweep_write_failure(sweep):
+    graphql, (gh, found, mutations) = sweep
+    found += [_pr(1)]
+    graphql.side_effect = [
+        {"search": {"pageInfo": {"hasNextPage": False}, "nodes": found}},
+        RuntimeError("boom"),
+    ]
+    with pytest.raises(RuntimeError):
+        tag_ready_to_merge("OCA")
+    # the PR is evaluated again by the next sweep, which is a full one
+    graphql.side_effect = None
+    graphql.return_value = {
+        "search": {"pageInfo": {"hasNextPage": False}, "nodes": found}
+    }
+    tag_ready_to_merge("OCA")
+    assert graphql.call_args.args[1].startswith("mutation")
+
+
+def test_tag_approved(mocker):
+    gh = mocker.MagicMock()
+    mocker.patch("oca_github_bot.github.login").return_value.__enter__.return_value = gh
+    mocker.patch("oca_github_bot.github.graphql").return_value = graphql_repository(
+        [("alice", "APPROVED"), ("bob", "APPROVED")]
+    )
+    tag_ready_to_merge = mocker.patch(
+        "oca_github_bot.tasks.tag_approved.tag_ready_to_merge"
+    )
+    tag_approved("OCA", "some-repo", 42)
+    gh.issue.assert_called_once_with("OCA", "some-repo", 42)
+    gh.issue.return_value.add_labels.assert_called_once_with("approved")
+    tag_ready_to_merge.delay.assert_called_once_with(
+        "OCA", "some-repo", 42, dry_run=False
+    )
+
+
+def test_tag_approved_not_mergeable(mocker):
+    gh = mocker.MagicMock()
+    mocker.patch("oca_github_bot.github.login").return_value.__enter__.return_value = gh
+    mocker.patch("oca_github_bot.github.graphql").return_value = graphql_repository(
+        [("alice", "APPROVED"), ("bob", "APPROVED")], mergeable="UNKNOWN"
+    )
+    tag_approved("OCA", "some-repo", 42)
+    gh.issue.assert_not_called()
+
+
+def test_tag_ready_to_merge_pr(mocker):
+    # unlike the hourly sweep, approved PRs are evaluated right away
+    assert not tag_ready_to_merge.low_priority
+    gh = mocker.MagicMock()
+    mocker.patch("oca_github_bot.github.login").return_value.__enter__.return_value = gh
+    graphql = mocker.patch("oca_github_bot.github.graphql")
+    graphql.return_value = graphql_repository([], labels=["approved", "ready to merge"])
+    tag_ready_to_merge("OCA", "some-repo", 42)
+    gh.issue.assert_not_called()
+    graphql.return_value = graphql_repository([], labels=["approved"])
+    tag_ready_to_merge("OCA", "some-repo", 42)
+    gh.search_issues.assert_not_called()
+    gh.issue.assert_called_once_with("OCA", "some-repo", 42)
+    gh.issue.return_value.add_labels.assert_called_once_with("ready to merge")
+    gh.issue.return_value.create_comment.assert_called_once()
+
+
+def test_tag_ready_to_merge_sha(sweep, mocker):
+    graphql, (gh, found, mutations) = sweep
+    found += [_pr(1)]
+    load_pr_snapshot = mocker.patch(
+        "oca_github_bot.tasks.tag_ready_to_merge.load_pr_snapshot"
+    )
+    is_ready = mocker.patch(
+        "oca_github_bot.tasks.tag_ready_to_merge._is_ready_to_merge",
+        return_value=True,
+    )
+    tag_ready_to_merge("OCA", "some-repo", sha="1" * 40)
+    # the PRs with that head are searched, without status filter
+    (search,) = (c for c in graphql.call_args_list if "searchQuery" in c.kwargs)
+    assert "1" * 40 in search.kwargs["searchQuery"]
+    assert "repo:OCA/some-repo" in search.kwargs["searchQuery"]
+    assert "status:success" not in search.kwargs["searchQuery"]
+    # and their status is read from their snapshot
+    load_pr_snapshot.assert_called_once_with(gh, "OCA", "some-repo", 1)
+    is_ready.assert_called_once()
+    gh.issue.return_value.add_labels.assert_called_once_with("ready to merge")
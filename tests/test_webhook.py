@@ -0,0 +1,88 @@
+# Copyright (c) ACSONE SA/NV 2026
+# Distributed under the MIT License (http://opensource.org/licenses/MIT).
+
+import json
+
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+
+from oca_github_bot import __main__ as main
+from oca_github_bot import queue
+from oca_github_bot.router import router
+from oca_github_bot.tasks.delete_branch import delete_branch
+
+HEADERS = {
+    "content-type": "application/json",
+    "x-github-event": "ping",
+    "x-github-delivery": "1",
+}
+BODY = json.dumps({"zen": "Keep it logically awesome."})
+
+
+@pytest.mark.asyncio
+async def test_webhook_shared_session(mocker):
+    dispatch = mocker.patch.object(router, "dispatch")
+    app = main.make_app()
+    async with TestClient(TestServer(app)) as client:
+        session = app[main.HTTP_SESSION]
+        for _ in range(2):
+            response = await client.post("/", data=BODY, headers=HEADERS)
+            assert response.status == 202
+        await app[main.EVENTS].join()
+        # the GitHub API client shares the application session
+        ghs = [call.args[1] for call in dispatch.call_args_list]
+        assert len(ghs) == 2
+        assert all(gh._session is session for gh in ghs)
+        # and is not constructed when handlers do not use it
+        assert all(gh._gh is None for gh in ghs)
+    assert session.closed
+
+
+@pytest.mark.asyncio
+async def test_webhook_batch_publish(mocker):
+    async def handler(event, gh):
+        delete_branch.delay("OCA", "some-repo", event.delivery_id)
+
+    mocker.patch.object(router, "dispatch", side_effect=handler)
+    publish_batch = mocker.patch.object(queue, "publish_batch")
+    app = main.make_app()
+    async with TestClient(TestServer(app)) as client:
+        response = await client.post("/", data=BODY, headers=HEADERS)
+        assert response.status == 202
+        await app[main.EVENTS].join()
+    publishes = publish_batch.call_args.args[0]
+    assert [(t, args) for t, args, _, _ in publishes] == [
+        (delete_branch, ("OCA", "some-repo", "1"))
+    ]
+
+
+@pytest.mark.asyncio
+async def test_webhook_redelivery(mocker, fake_cache):
+    dispatch = mocker.patch.object(router, "dispatch")
+    app = main.make_app()
+    async with TestClient(TestServer(app)) as client:
+        for _ in range(2):
+            response = await client.post("/", data=BODY, headers=HEADERS)
+            assert response.status == 202
+            await app[main.EVENTS].join()
+    dispatch.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_webhook_publish_failure(mocker, fake_cache):
+    async def handler(event, gh):
+        delete_branch.delay("OCA", "some-repo", "branch")
+
+    dispatch = mocker.patch.object(router, "dispatch", side_effect=handler)
+    apply_async = mocker.patch("celery.Task.apply_async")
+    apply_async.side_effect = [ConnectionError("broker down"), None]
+    mocker.patch.object(queue.app, "producer_or_acquire")
+    app = main.make_app()
+    async with TestClient(TestServer(app)) as client:
+        for _ in range(2):
+            response = await client.post("/", data=BODY, headers=HEADERS)
+            assert response.status == 202
+            await app[main.EVENTS].join()
+    # the redelivery of the event is handled, and its task published
+    assert dispatch.call_count == 2
+    assert apply_async.call_count == 2